@@ -2,12 +2,47 @@ import streamlit as st
 from src.validate_keys  import check_openai_api_key, check_llama_cloud_api_key
 from src.arxiv_handler import fetch_papers
 from src.outline_generator import generate_default_outline
-from src.report_generator import generate_report
+from src.jobs import get_job_manager, STAGES
+from src.llm_cache import get_llm_cache
+from src.parsers import PARSER_BACKENDS
 import asyncio
 
 import nest_asyncio
 nest_asyncio.apply()
 
+
+@st.fragment(run_every=2)
+def show_job(job_id):
+    # reruns on its own every 2s, so polling never reruns (or blocks) the rest of the page
+    job = get_job_manager().get(job_id)
+    done_stages = sum(job["stages"][stage]["status"] == "done" for stage in STAGES)
+    if job["status"] in ("queued", "running"):
+        st.progress(done_stages / len(STAGES), text=f"Report job {job_id}: {job['status']} ({job['stage'] or 'waiting for a worker'})")
+    elif job["status"] == "failed":
+        st.error(f"Report job {job_id} failed: {job['error']}")
+    st.markdown("".join(job["report_sections"]))
+
+    # rerun the whole page once when the job finishes so the sidebar timings appear
+    if job["status"] == "done" and st.session_state.get("finished_job_id") != job_id:
+        st.session_state.finished_job_id = job_id
+        st.rerun()
+
+
+def show_timings(job_id):
+    st.sidebar.subheader("Report timings")
+    st.sidebar.dataframe(get_job_manager().get(job_id).get("timings", []), hide_index=True)
+    cache_stats = get_llm_cache().stats()
+    st.sidebar.caption(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)")
+    from src.retrieval_cache import get_retrieval_cache
+
+    retrieval_stats = get_retrieval_cache().stats()
+    st.sidebar.caption(f"Retrieval cache: {retrieval_stats['exact_hits']} exact + {retrieval_stats['semantic_hits']} semantic hits, {retrieval_stats['misses']} misses")
+    from src.rate_limiter import get_limiter
+
+    openai_limiter = get_limiter("openai", st.session_state.openai_api_key or None).stats()
+    st.sidebar.caption(f"OpenAI concurrency limit {openai_limiter['limit']} (peak {openai_limiter['peak_in_flight']} in flight, {openai_limiter['throttled']} throttled)")
+    st.sidebar.caption(f"Trace exported to {get_job_manager().path(job_id, 'trace.json')}")
+
 async def main():
 
     st.set_page_config(page_title="AI Research Assistant", layout="wide")
@@ -37,6 +72,7 @@ async def main():
 
     openai_api_key = st.sidebar.text_input("Enter your OpenAI API Key", type="password")
     llama_cloud_api_key = st.sidebar.text_input("Enter your Llama Cloud API Key", type="password")
+    parser_backend = st.sidebar.selectbox("PDF parser", PARSER_BACKENDS, help="'local' extracts text with pypdf instead of calling LlamaParse")
 
     st.session_state.openai_api_key = openai_api_key
     st.session_state.llama_cloud_api_key = llama_cloud_api_key
@@ -51,10 +87,15 @@ async def main():
             st.session_state.validate_openai_api_key = check_openai_api_key(st.session_state.openai_api_key)
             st.session_state.validate_llama_cloud_api_key = check_llama_cloud_api_key(st.session_state.llama_cloud_api_key)
             
-            if not st.session_state.validate_openai_api_key:
+            # None means the provider could not be reached, which says nothing about the key
+            if st.session_state.validate_openai_api_key is None:
+                st.sidebar.warning("Could not reach OpenAI to verify the key. Please retry.")
+            elif not st.session_state.validate_openai_api_key:
                 st.sidebar.error("Invalid OpenAI API Key.")
                 
-            if not st.session_state.validate_llama_cloud_api_key:
+            if st.session_state.validate_llama_cloud_api_key is None:
+                st.sidebar.warning("Could not reach Llama Cloud to verify the key. Please retry.")
+            elif not st.session_state.validate_llama_cloud_api_key:
                 st.sidebar.error("Invalid Llama Cloud API Key.")
 
 
@@ -121,9 +162,18 @@ async def main():
         
         
         if st.session_state.selected_papers and st.button("Generate Report"):
-            with st.spinner("Generating the report..."):
-                report = await generate_report(selected_papers = st.session_state.selected_papers, outline = st.session_state.outline, openai_api_key = st.session_state.openai_api_key)
-                st.markdown(report)
+            st.session_state.job_id = get_job_manager().submit(
+                st.session_state.selected_papers,
+                st.session_state.outline,
+                parser_backend=parser_backend,
+                openai_api_key=st.session_state.openai_api_key,
+                llama_cloud_api_key=st.session_state.llama_cloud_api_key,
+            )
+
+        if st.session_state.get("job_id"):
+            show_job(st.session_state.job_id)
+            if st.session_state.get("finished_job_id") == st.session_state.job_id:
+                show_timings(st.session_state.job_id)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+"""Measure cold-start import time of the app modules in fresh interpreters.
+
+"lazy" imports the modules as they are; "eager" additionally imports the SDKs that used to be
+loaded at module import time (OpenAI LLM, llama_cloud, llama_parse, LlamaCloudIndex, numpy), which
+is what every Streamlit rerun or CLI start paid before. The heaviest imports come from
+`python -X importtime`.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_cold_start
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ["src.report_generator", "src.jobs", "cli"]
+EAGER_IMPORTS = [
+    "llama_index.llms.openai",
+    "llama_cloud.client",
+    "llama_cloud.types",
+    "llama_parse",
+    "llama_index.indices.managed.llama_cloud",
+    "llama_index.core",
+    "numpy",
+]
+
+
+def time_import(statement, runs=5):
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"],
+            capture_output=True, text=True, env=env,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def heaviest_imports(statement, top=10):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    for module in MODULES:
+        lazy = time_import(f"import {module}")
+        eager = time_import("; ".join(f"import {name}" for name in EAGER_IMPORTS + [module]))
+        print(f"{module:22s} lazy {lazy * 1000:7.0f}ms   eager {eager * 1000:7.0f}ms")
+
+    print("\nheaviest imports for src.report_generator (cumulative us):")
+    for cumulative, name in heaviest_imports("import src.report_generator"):
+        print(f"{cumulative:10d}  {name}")
+
+
+if __name__ == "__main__":
+    main()
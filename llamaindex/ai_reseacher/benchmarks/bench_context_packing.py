@@ -0,0 +1,54 @@
+"""Compare prompt sizes before and after token-aware context packing.
+
+Uses the bundled parsed papers in data/parsed_docs when they can be loaded, otherwise synthetic
+papers. Run from the ai_reseacher directory:
+    python -m benchmarks.bench_context_packing
+"""
+import asyncio
+import glob
+import pickle
+import random
+import time
+
+from benchmarks.fakes import FakeDocument, FakeLLM
+from src.context_packing import PROMPT_BUDGETS, apack, metadata_context
+from src.doc_store import PARSED_DOCS_DIR
+from src.instrumentation import count_tokens
+
+
+def load_papers():
+    papers = []
+    for path in sorted(glob.glob(f"{PARSED_DOCS_DIR}/*.pkl")):
+        try:
+            with open(path, "rb") as f:
+                papers.append(pickle.load(f))
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+    if papers:
+        return papers
+    rng = random.Random(0)
+    words = [f"word{i}" for i in range(2000)]
+    return [[FakeDocument(" ".join(rng.choices(words, k=rng.randint(300, 1500)))) for _ in range(10)] for _ in range(10)]
+
+
+def main():
+    papers = load_papers()
+    old = [count_tokens("".join(page.text for page in paper[:3])) for paper in papers]
+    new = [count_tokens(metadata_context(paper)) for paper in papers]
+    print(f"metadata prompt: {sum(old)} -> {sum(new)} tokens over {len(papers)} papers "
+          f"(max {max(old)} -> {max(new)}, budget {PROMPT_BUDGETS['metadata']})")
+
+    # a body section built from long subsection answers
+    answers = ["".join(page.text for page in paper[:2]) for paper in papers[:4]]
+    budget = PROMPT_BUDGETS["section_summary"]
+    joined = count_tokens("\n".join(answers))
+    truncated = asyncio.run(apack(answers, budget))
+    start = time.perf_counter()
+    summarized = asyncio.run(apack(answers, budget, llm=FakeLLM(latency=0.1)))
+    summarize_time = time.perf_counter() - start
+    print(f"section prompt: {joined} tokens joined, {count_tokens(truncated)} fair-truncated, "
+          f"{count_tokens(summarized)} map-reduced in {summarize_time:.2f}s (budget {budget})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Measure streaming ingest throughput, peak memory and de-duplication as the number of papers grows.
+
+Papers are generated one at a time, so peak memory reflects the pipeline's working set rather than
+the input. Run from the ai_reseacher directory:
+    python -m benchmarks.bench_embedding_pipeline
+"""
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeDocument
+from src.embedding_pipeline import EmbeddingPipeline, VectorStore, stream_chunks
+from src.local_index import HashingEmbedder
+
+VOCABULARY = [f"term{i}" for i in range(5000)]
+BOILERPLATE = " ".join(VOCABULARY[:1024])  # an identical chunk shared by every paper
+
+
+def papers(count, pages=12, words_per_page=800):
+    for seed in range(count):
+        rng = random.Random(seed)
+        yield [FakeDocument(BOILERPLATE)] + [
+            FakeDocument(" ".join(rng.choices(VOCABULARY, k=words_per_page))) for _ in range(pages)
+        ]
+
+
+def ingest(count):
+    with tempfile.TemporaryDirectory() as path:
+        embedder = HashingEmbedder()
+        pipeline = EmbeddingPipeline(embedder, VectorStore(path, embedder.dim))
+        tracemalloc.start()
+        start = time.perf_counter()
+        for paper_id, paper in enumerate(papers(count)):
+            for _ in pipeline.ingest(stream_chunks(paper), {"paper_id": str(paper_id)}):
+                pass
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return len(pipeline.store), pipeline.duplicates, elapsed, peak
+
+
+def main():
+    for count in (10, 40, 160):
+        stored, duplicates, elapsed, peak = ingest(count)
+        print(f"{count:4d} papers: {stored} chunks stored, {duplicates} duplicates skipped, "
+              f"{stored / elapsed:.0f} chunks/s, peak traced memory {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
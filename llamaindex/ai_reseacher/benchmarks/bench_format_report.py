@@ -0,0 +1,44 @@
+"""Compare the streaming formatter refining one section at a time with all refinements in flight,
+including time to first section.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_format_report
+"""
+import asyncio
+import time
+
+from benchmarks.fakes import FakeLLM, FakeQueryEngine, make_queries
+from src.report_generator import ReportGenerationAgent
+
+OUTLINE = "# Benchmark Report\n"
+
+
+async def stream(agent, sections_content):
+    start = time.perf_counter()
+    first_section = None
+    chunks = []
+    async for chunk in agent.astream_report(sections_content, OUTLINE):
+        chunks.append(chunk)
+        # the title is yielded immediately, so the first real section is the second chunk
+        if len(chunks) == 2:
+            first_section = time.perf_counter() - start
+    return "".join(chunks), first_section, time.perf_counter() - start
+
+
+def main():
+    agent = ReportGenerationAgent(FakeQueryEngine(latency=0.0), FakeLLM(latency=0.2))
+    serial_agent = ReportGenerationAgent(FakeQueryEngine(latency=0.0), FakeLLM(latency=0.2), max_concurrency=1)
+    queries = make_queries(num_sections=6, subsections_per_section=3)
+    queries = {"1. Introduction": {"General": {"query": "intro", "classification": "LLM"}}, **queries}
+    sections_content = asyncio.run(agent.agenerate_section_content(queries))
+
+    serial, serial_first, serial_time = asyncio.run(stream(serial_agent, sections_content))
+    streamed, first_section, stream_time = asyncio.run(stream(agent, sections_content))
+
+    assert serial == streamed, "concurrent refinement changed the report"
+    print(f"serial:     total {serial_time:.2f}s, first section after {serial_first:.2f}s")
+    print(f"concurrent: total {stream_time:.2f}s, first section after {first_section:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Show that re-running upload_documents only ingests new or changed papers.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_incremental_upload
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeDocument, FakeLLM, FakeLlamaCloud
+from src import llama_parse_utils
+from src.ingest_manifest import IngestManifest
+
+
+def make_papers(count, revision=0):
+    return [[FakeDocument(f"paper {i} rev {revision} page {p}") for p in range(4)] for i in range(count)]
+
+
+async def timed_upload(documents, client, manifest, llm):
+    start = time.perf_counter()
+    uploaded = await llama_parse_utils.upload_documents(documents, client=client, manifest=manifest, llm=llm)
+    return uploaded, time.perf_counter() - start
+
+
+async def main():
+    llm = FakeLLM(latency=0.2)
+    client = FakeLlamaCloud(latency=0.1)
+    with tempfile.TemporaryDirectory() as workdir:
+        manifest = IngestManifest(os.path.join(workdir, "manifest.json"))
+        papers = make_papers(8)
+        changed = papers[:6] + make_papers(8, revision=1)[6:]
+
+        for label, documents in (("first run", papers), ("unchanged", papers), ("2 changed", changed)):
+            llm.calls = 0
+            uploaded, elapsed = await timed_upload(documents, client, manifest, llm)
+            print(f"{label:10s} uploaded {uploaded} docs, {llm.calls} metadata calls, {elapsed:.2f}s")
+    print(f"pipeline upserts: {client.pipelines.pipeline_upserts}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
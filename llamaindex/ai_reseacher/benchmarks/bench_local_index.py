@@ -0,0 +1,46 @@
+"""Measure local hybrid index ingest and per-query latency on synthetic papers.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_local_index
+"""
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.fakes import FakeDocument
+from src.local_index import LocalHybridIndex
+
+VOCABULARY = [f"term{i}" for i in range(5000)]
+
+
+def make_papers(count, pages=12, words_per_page=800, seed=0):
+    rng = random.Random(seed)
+    return [
+        [FakeDocument(" ".join(rng.choices(VOCABULARY, k=words_per_page))) for _ in range(pages)]
+        for _ in range(count)
+    ]
+
+
+def main():
+    papers = make_papers(40)
+    queries = [" ".join(random.Random(i).choices(VOCABULARY, k=8)) for i in range(200)]
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalHybridIndex(path)
+        start = time.perf_counter()
+        index.add_documents(papers)
+        ingest = time.perf_counter() - start
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.retrieve(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    print(f"chunks indexed: {len(index.store)} in {ingest:.2f}s")
+    print(f"query p50 {statistics.median(latencies):.2f}ms  p95 {latencies[int(len(latencies) * 0.95)]:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Compare the local pypdf parser at several process-pool sizes over data/papers/*.pdf, and
+LlamaParse when LLAMA_CLOUD_API_KEY is set. Reports pages per second and output size.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_parsers
+"""
+import glob
+import os
+import time
+
+from src.doc_store import PAPERS_DIR
+from src.parsers import LocalPDFParser, get_parser
+
+
+def run(parser, pdf_paths):
+    start = time.perf_counter()
+    documents = [parser.load_data(path) for path in pdf_paths]
+    elapsed = time.perf_counter() - start
+    pages = sum(len(document) for document in documents)
+    chars = sum(len(page.text) for document in documents for page in document)
+    return pages, chars, elapsed
+
+
+def main():
+    pdf_paths = sorted(glob.glob(f"{PAPERS_DIR}/*.pdf"))
+    if not pdf_paths:
+        print(f"No PDFs in {PAPERS_DIR}")
+        return
+    parsers = [(f"local, {workers} workers", LocalPDFParser(num_workers=workers)) for workers in (1, 2, 4)]
+    if os.environ.get("LLAMA_CLOUD_API_KEY"):
+        parsers.append(("llamaparse", get_parser("llamaparse")))
+    for label, parser in parsers:
+        if not getattr(parser, "remote", True):
+            run(parser, pdf_paths[:1])  # start the worker processes outside the timing
+        pages, chars, elapsed = run(parser, pdf_paths)
+        print(f"{label:20s} {len(pdf_paths)} papers, {pages} pages in {elapsed:.2f}s "
+              f"({pages / elapsed:.1f} pages/s), {chars / 1024:.0f} KiB of text")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Retrieval latency vs. corpus size, searching the whole local index or one report's partition.
+
+A report selects 5 papers; the index holds those plus an increasing number of other papers. The
+partitioned query only scores the report's chunks, so its latency should stay flat as the
+corpus grows. The run ends with garbage collection of the other papers' expired partitions.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_partitions
+"""
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_local_index import VOCABULARY, make_papers
+from src.ingest_manifest import document_key
+from src.local_index import LocalHybridIndex
+
+REPORT_PAPERS = 5
+
+
+def query_latency(index, queries, paper_ids=None):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.retrieve(query, paper_ids=paper_ids)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    queries = [" ".join(random.Random(i).choices(VOCABULARY, k=8)) for i in range(100)]
+    report = make_papers(REPORT_PAPERS, pages=6, seed=1)
+    report_ids = [document_key(paper)[0] for paper in report]
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalHybridIndex(path)
+        index.touch_partition(report_ids)
+        index.add_documents(report)
+        other = []
+        for corpus in (REPORT_PAPERS, 25, 100, 400):
+            papers = make_papers(corpus - REPORT_PAPERS, pages=6, seed=2)[len(other):]
+            if papers:
+                index.touch_partition([document_key(paper)[0] for paper in papers])
+                index.add_documents(papers)
+                other += papers
+            full = query_latency(index, queries)
+            partition = query_latency(index, queries, paper_ids=report_ids)
+            print(
+                f"{corpus:4d} papers ({len(index.store):5d} chunks): whole index p50 {full[0]:6.2f}ms p95 {full[1]:6.2f}ms"
+                f"  | partition p50 {partition[0]:5.2f}ms p95 {partition[1]:5.2f}ms"
+            )
+
+        # a week later only the report's partition is used again
+        for entry in index.meta["partitions"].values():
+            entry["last_used"] -= 8 * 24 * 3600
+        index.touch_partition(report_ids)
+        start = time.perf_counter()
+        dropped = index.collect_garbage()
+        elapsed = time.perf_counter() - start
+        partition = query_latency(index, queries, paper_ids=report_ids)
+        print(f"collected {dropped} papers in {elapsed:.2f}s, {len(index.store)} chunks left, partition p50 {partition[0]:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
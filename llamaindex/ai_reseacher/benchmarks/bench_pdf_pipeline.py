@@ -0,0 +1,63 @@
+"""Compare serial vs. pipelined PDF download + parse against a local HTTP server and a stub parser.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_pdf_pipeline
+"""
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fakes import FakeParser
+from src.pdf_handler import parse_and_cache_pdfs
+
+PDF_BYTES = b"%PDF-1.4\n" + b"0" * (2 * 1024 * 1024)
+SERVER_LATENCY = 0.2
+
+
+class SlowPDFHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(SERVER_LATENCY)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(PDF_BYTES)))
+        self.end_headers()
+        self.wfile.write(PDF_BYTES)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(papers, max_workers):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            timings = {}
+            docs = parse_and_cache_pdfs(papers, max_downloads=max_workers, max_parses=max_workers, parser=FakeParser(latency=0.2), timings=timings)
+        finally:
+            os.chdir(cwd)
+    assert len(docs) == len(papers)
+    return timings
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowPDFHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    papers = [{"id": f"http://arxiv.org/abs/0000.{i:05d}v1", "title": f"Paper {i}", "url": f"{base_url}/{i}.pdf"} for i in range(8)]
+
+    try:
+        serial = run(papers, max_workers=1)
+        pipelined = run(papers, max_workers=4)
+    finally:
+        server.shutdown()
+
+    for name, timings in (("serial", serial), ("pipelined", pipelined)):
+        print(f"{name:10s} total {timings['total']:.2f}s  download {timings['download']:.2f}s  parse {timings['parse']:.2f}s")
+    print(f"speedup: {serial['total'] / pipelined['total']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
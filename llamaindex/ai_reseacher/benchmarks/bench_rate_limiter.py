@@ -0,0 +1,93 @@
+"""Drive a fake provider that answers 429 above a concurrency threshold with a fixed worker count,
+an unbounded burst and the adaptive limiter, and compare throughput and throttling.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_rate_limiter
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from src.rate_limiter import AdaptiveLimiter
+
+THRESHOLD = 16  # concurrent requests the fake provider accepts
+LATENCY = 0.05
+NUM_REQUESTS = 600
+
+
+class FakeProvider(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    active = 0
+    throttled = 0
+
+    def do_GET(self):
+        with FakeProvider.lock:
+            FakeProvider.active += 1
+            over = FakeProvider.active > THRESHOLD
+            if over:
+                FakeProvider.throttled += 1
+        try:
+            time.sleep(LATENCY / 5 if over else LATENCY)
+            self.send_response(429 if over else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        finally:
+            with FakeProvider.lock:
+                FakeProvider.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def run(url, workers, limiter=None):
+    FakeProvider.throttled = 0
+    local = threading.local()
+
+    def request():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        response = local.session.get(url)
+        response.raise_for_status()
+
+    def task():
+        try:
+            if limiter is None:
+                request()
+            else:
+                limiter.call(request)
+            return True
+        except requests.HTTPError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ok = sum(pool.map(lambda _: task(), range(NUM_REQUESTS)))
+    elapsed = time.perf_counter() - start
+    return ok, elapsed, FakeProvider.throttled
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    try:
+        for label, workers, limiter in [
+            ("fixed 4 workers", 4, None),
+            ("burst 64 workers", 64, None),
+            ("adaptive (64 workers)", 64, AdaptiveLimiter("fake", initial_limit=4, max_limit=64, base_delay=0.05, max_retries=10)),
+        ]:
+            ok, elapsed, throttled = run(url, workers, limiter)
+            line = f"{label:22s} {ok}/{NUM_REQUESTS} ok in {elapsed:.2f}s ({ok / elapsed:.0f} req/s), {throttled} 429s"
+            if limiter is not None:
+                stats = limiter.stats()
+                line += f", final limit {stats['limit']}, peak in flight {stats['peak_in_flight']}"
+            print(line)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
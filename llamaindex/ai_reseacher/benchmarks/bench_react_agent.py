@@ -0,0 +1,72 @@
+"""Multi-tool ReAct tasks against a scripted fake LLM: one action per step (as in reACT.ipynb)
+versus parallel actions, prompt tokens with and without a memory budget, and tool cache reuse.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_react_agent
+"""
+import asyncio
+import re
+import time
+
+from benchmarks.fakes import FakeQueryEngine, FakeResponse
+from src.instrumentation import count_tokens
+from src.react_agent import ReActAgent, Tool
+
+TOPICS = ["retrieval", "agents", "evaluation", "multimodal"]
+
+
+class ScriptedReActLLM:
+    """Searches every topic, either all in one step or one per step, then answers"""
+
+    def __init__(self, parallel, latency=0.1):
+        self.parallel = parallel
+        self.latency = latency
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.searched = {}  # question -> topics searched so far
+
+    async def acomplete(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        self.prompt_tokens += count_tokens(prompt)
+        question = re.search(r"Question: (.*)", prompt).group(1)
+        done = self.searched.get(question, 0)
+        if done >= len(TOPICS):
+            self.searched[question] = 0
+            return FakeResponse("Thought: I can answer without using any more tools.\nAnswer: summary")
+        topics = TOPICS if self.parallel else TOPICS[done:done + 1]
+        self.searched[question] = done + len(topics)
+        actions = "\n".join(f'Action: search_papers\nAction Input: {{"query": "{question} {topic}"}}' for topic in topics)
+        return FakeResponse(f"Thought: I need to search.\n{actions}")
+
+
+class LongTextEngine(FakeQueryEngine):
+    def answer(self, query):
+        self.calls += 1
+        return FakeResponse(f"{query}: " + "finding " * 1500)
+
+
+async def run(llm, engine, questions, **kwargs):
+    agent = ReActAgent(llm, [Tool.from_query_engine(engine)], **kwargs)
+    start = time.perf_counter()
+    for question in questions:
+        await agent.arun(question)
+    return time.perf_counter() - start, agent
+
+
+async def main():
+    questions = ["q1", "q2", "q1"]  # the repeated question is answered from the tool cache
+    for label, parallel in (("one action per step", False), ("parallel actions", True)):
+        llm, engine = ScriptedReActLLM(parallel), FakeQueryEngine(latency=0.2)
+        elapsed, agent = await run(llm, engine, questions)
+        print(f"{label:20s} {elapsed:.2f}s, {llm.calls} LLM steps, {engine.calls} searches "
+              f"({agent.tool_cache.hits} tool cache hits)")
+
+    for label, budget in (("unbounded memory", 10 ** 9), ("3000-token memory", 3000)):
+        llm = ScriptedReActLLM(parallel=False, latency=0.0)
+        await run(llm, LongTextEngine(latency=0.0), ["long task"], memory_budget=budget, max_observation_tokens=10 ** 9 if budget > 3000 else 600)
+        print(f"{label:20s} {llm.prompt_tokens} prompt tokens over {llm.calls} steps")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
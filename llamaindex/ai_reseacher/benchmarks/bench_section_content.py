@@ -0,0 +1,34 @@
+"""Compare serial (one call at a time) vs. concurrent section content generation against fake backends.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.bench_section_content
+"""
+import asyncio
+import time
+
+from benchmarks.fakes import FakeLLM, FakeQueryEngine, make_queries
+from src.report_generator import ReportGenerationAgent
+
+
+def main():
+    queries = make_queries(num_sections=3, subsections_per_section=4)
+    serial_agent = ReportGenerationAgent(FakeQueryEngine(latency=0.1), FakeLLM(latency=0.05), max_concurrency=1)
+    agent = ReportGenerationAgent(FakeQueryEngine(latency=0.1), FakeLLM(latency=0.05), max_concurrency=8)
+
+    start = time.perf_counter()
+    serial = asyncio.run(serial_agent.agenerate_section_content(queries))
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    concurrent = asyncio.run(agent.agenerate_section_content(queries))
+    concurrent_time = time.perf_counter() - start
+
+    assert serial == concurrent, "concurrent mode changed the result"
+    print(f"subsections: {sum(len(s) for s in queries.values())}")
+    print(f"serial:     {serial_time:.3f}s")
+    print(f"concurrent: {concurrent_time:.3f}s")
+    print(f"speedup:    {serial_time / concurrent_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
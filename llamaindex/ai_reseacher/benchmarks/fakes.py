@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import random
+import re
+import time
+
+# keys for code paths that fall back to the environment; the fakes never touch the network
+os.environ.setdefault("OPENAI_API_KEY", "fake-openai-key")
+os.environ.setdefault("LLAMA_CLOUD_API_KEY", "fake-llama-cloud-key")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+
+class FakeRateLimitError(Exception):
+    """Looks like a provider 429 to src.rate_limiter, so injected failures are retried."""
+
+    status_code = 429
+
+
+class Flaky:
+    """Seeded failure injection: each call fails with probability `failure_rate`."""
+
+    def __init__(self, failure_rate=0.0, seed=0):
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.failures = 0
+
+    def maybe_fail(self):
+        if self.failure_rate and self.rng.random() < self.failure_rate:
+            self.failures += 1
+            raise FakeRateLimitError(f"{type(self).__name__}: injected 429")
+
+
+JSON_LIST_REQUEST = re.compile(r"JSON list of exactly (\d+) strings")
+
+
+class FakeLLM(Flaky):
+    """Deterministic stand-in for the OpenAI LLM with injected latency and failures.
+    Batch planning prompts get a JSON list back, everything else a short answer."""
+
+    def __init__(self, latency=0.05, failure_rate=0.0, seed=0):
+        super().__init__(failure_rate, seed)
+        self.latency = latency
+        self.calls = 0
+
+    def answer(self, prompt):
+        self.calls += 1
+        self.maybe_fail()
+        match = JSON_LIST_REQUEST.search(prompt)
+        if match:
+            count = int(match.group(1))
+            if '"LLM" or "INDEX"' in prompt:
+                return FakeResponse(json.dumps(["INDEX" if i % 2 else "LLM" for i in range(count)]))
+            return FakeResponse(json.dumps([f"query {i + 1}" for i in range(count)]))
+        return FakeResponse(f"answer({len(prompt)})")
+
+    def complete(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return self.answer(prompt)
+
+    async def acomplete(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.answer(prompt)
+
+    async def astructured_predict(self, output_cls, prompt, **prompt_args):
+        await asyncio.sleep(self.latency)
+        self.calls += 1
+        self.maybe_fail()
+        return output_cls(**{name: [] for name in output_cls.model_fields})
+
+
+class FakeQueryEngine(Flaky):
+    """Deterministic stand-in for the LlamaCloud query engine with injected latency and failures."""
+
+    def __init__(self, latency=0.1, failure_rate=0.0, seed=0):
+        super().__init__(failure_rate, seed)
+        self.latency = latency
+        self.calls = 0
+
+    def answer(self, query):
+        self.calls += 1
+        self.maybe_fail()
+        return FakeResponse(f"retrieved({query})")
+
+    def query(self, query):
+        time.sleep(self.latency)
+        return self.answer(query)
+
+    async def aquery(self, query):
+        await asyncio.sleep(self.latency)
+        return self.answer(query)
+
+
+def make_queries(num_sections=3, subsections_per_section=4):
+    queries = {}
+    for s in range(1, num_sections + 1):
+        section = f"{s}. Section {s}"
+        queries[section] = {}
+        for sub in range(1, subsections_per_section + 1):
+            queries[section][f"{s}.{sub}. Subsection {sub}"] = {
+                "query": f"query for {s}.{sub}",
+                "classification": "INDEX" if sub % 2 else "LLM",
+            }
+    return queries
+
+
+class FakeDocument:
+    def __init__(self, text, metadata=None):
+        self.text = text
+        self.metadata = metadata or {}
+
+
+class FakeParser(Flaky):
+    """Stand-in for LlamaParse: returns a few pages per PDF after a fixed delay."""
+
+    def __init__(self, latency=0.2, pages=4, failure_rate=0.0, seed=0):
+        super().__init__(failure_rate, seed)
+        self.latency = latency
+        self.pages = pages
+        self.calls = 0
+
+    def load_data(self, pdf_path):
+        time.sleep(self.latency)
+        self.calls += 1
+        self.maybe_fail()
+        return [FakeDocument(f"# {pdf_path} page {i + 1}\n\nlorem ipsum " * 20) for i in range(self.pages)]
+
+
+class FakeCloudDocument:
+    def __init__(self, id):
+        self.id = id
+
+
+class FakePipelines(Flaky):
+    def __init__(self, latency, failure_rate=0.0, seed=0):
+        super().__init__(failure_rate, seed)
+        self.latency = latency
+        self.pipeline_upserts = 0
+        self.documents = {}
+        self.documents_uploaded = 0
+
+    def upsert_pipeline(self, request, project_id=None):
+        time.sleep(self.latency)
+        self.maybe_fail()
+        self.pipeline_upserts += 1
+        return FakeCloudDocument(id=f"pipeline-{request['name']}")
+
+    def upsert_batch_pipeline_documents(self, pipeline_id, request):
+        time.sleep(self.latency)
+        self.maybe_fail()
+        stored = []
+        for document in request:
+            self.documents[(pipeline_id, document.id)] = document
+            self.documents_uploaded += 1
+            stored.append(FakeCloudDocument(id=document.id))
+        return stored
+
+    def delete_pipeline_document(self, document_id, pipeline_id):
+        # same argument order as llama_cloud's PipelinesClient
+        time.sleep(self.latency)
+        self.maybe_fail()
+        del self.documents[(pipeline_id, document_id)]
+
+
+class FakeProjects:
+    def list_projects(self, project_name=None):
+        return [FakeCloudDocument(id=f"project-{project_name}")]
+
+
+class FakeLlamaCloud:
+    """Records pipeline/document upserts in memory instead of calling LlamaCloud."""
+
+    def __init__(self, latency=0.1, failure_rate=0.0, seed=0):
+        self.pipelines = FakePipelines(latency, failure_rate, seed)
+        self.projects = FakeProjects()
+
+
+class FakeAuthor:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeArxivResult:
+    def __init__(self, number):
+        self.entry_id = f"http://arxiv.org/abs/2412.{number:05d}v1"
+        self.title = f"Paper {number}"
+        self.authors = [FakeAuthor(f"Author {number}")]
+        self.pdf_url = f"http://arxiv.org/pdf/2412.{number:05d}v1"
+
+
+class FakeArxivClient(Flaky):
+    """Stand-in for arxiv.Client. Each query maps to a fixed set of papers, and neighbouring
+    queries overlap so de-duplication is exercised."""
+
+    def __init__(self, latency=0.3, failure_rate=0.0, seed=0):
+        super().__init__(failure_rate, seed)
+        self.latency = latency
+        self.calls = 0
+
+    def results(self, search):
+        time.sleep(self.latency)
+        self.calls += 1
+        self.maybe_fail()
+        base = sum(map(ord, search.query)) % 50
+        return [FakeArxivResult(base + i) for i in range(search.max_results)]
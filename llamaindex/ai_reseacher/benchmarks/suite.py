@@ -0,0 +1,227 @@
+"""Benchmark and regression suite for the report pipeline, run against deterministic fakes.
+
+Each scenario drives a real pipeline entry point (run_workflow, parse_and_cache_pdfs,
+upload_documents, fetch_papers) with fake LLM / query engine / parser / cloud / arXiv backends of
+configurable latency and failure rate, using the bundled data/papers and data/parsed_docs as
+fixtures. Injected failures look like 429s, so they exercise the real retry path. Every scenario
+reports p50/p95 latency, throughput, backend call counts and peak traced memory, and is compared
+against stored baselines.
+
+Run from the ai_reseacher directory:
+    python -m benchmarks.suite                    # compare against benchmarks/baselines.json
+    python -m benchmarks.suite --save-baseline    # record the current numbers as the baseline
+    python -m benchmarks.suite --only workflow parse --failure-rate 0.05
+
+Exits with status 1 if a scenario fails or a metric regresses by more than --tolerance.
+Scenarios whose SDK dependencies are not installed are reported as skipped.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeArxivClient, FakeLLM, FakeLlamaCloud, FakeParser, FakeQueryEngine
+from src import arxiv_handler, doc_store, registry
+from src.doc_store import PAPERS_DIR, PARSED_DOCS_DIR
+from src.ingest_manifest import IngestManifest
+from src.llama_parse_utils import upload_documents
+from src.outline_generator import generate_default_outline
+from src.pdf_handler import parse_and_cache_pdfs
+from src.rate_limiter import PROVIDER_LIMITS, AdaptiveLimiter, RateLimitedLLM, RateLimitedQueryEngine, get_limiter, provider_settings
+from src.report_generator import ReportGenerationAgent
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# metric -> True when bigger is better
+METRICS = {"p50": False, "p95": False, "throughput": True, "calls": False, "peak_mib": False}
+
+
+def fixture_papers():
+    papers = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "papers", "*.pdf"))):
+        paper_id = os.path.basename(path)[: -len(".pdf")]
+        papers.append({"id": f"http://arxiv.org/abs/{paper_id}", "title": f"Paper {paper_id}", "authors": "", "url": f"http://127.0.0.1:9/{paper_id}.pdf"})
+    return papers
+
+
+def fixture_documents(workdir):
+    # read through the doc store like the app; legacy pickles are migrated into the scenario's workdir
+    shutil.copytree(os.path.join(DATA_DIR, "parsed_docs"), os.path.join(workdir, PARSED_DOCS_DIR))
+    paths = glob.glob(f"{PARSED_DOCS_DIR}/*.jsonl") + glob.glob(f"{PARSED_DOCS_DIR}/*.pkl")
+    paper_ids = sorted({os.path.splitext(os.path.basename(path))[0] for path in paths})
+    documents = []
+    for paper_id in paper_ids:
+        document = doc_store.load(paper_id, f"{PAPERS_DIR}/{paper_id}.pdf", doc_store.LLAMA_PARSE_SETTINGS)
+        if document is None:
+            document = doc_store.migrate_pickle(f"{PARSED_DOCS_DIR}/{paper_id}.pkl")
+        documents.append(document)
+    return documents
+
+
+def use_fast_limiters():
+    # same AIMD behaviour, but millisecond backoff and no per-minute pacing so runs stay comparable
+    registry.clear()
+    for provider in PROVIDER_LIMITS:
+        settings = {**provider_settings(provider), "requests_per_minute": None, "tokens_per_minute": None}
+        registry.get_or_create(
+            ("limiter", provider, None),
+            lambda provider=provider, settings=settings: AdaptiveLimiter(provider, base_delay=0.01, max_delay=0.2, max_retries=10, **settings),
+        )
+
+
+def bench_workflow(config, workdir):
+    llm = FakeLLM(latency=0.05 * config["latency_scale"], failure_rate=config["failure_rate"], seed=config["seed"])
+    engine = FakeQueryEngine(latency=0.1 * config["latency_scale"], failure_rate=config["failure_rate"], seed=config["seed"])
+    agent = ReportGenerationAgent(RateLimitedQueryEngine(engine, get_limiter("llamacloud")), RateLimitedLLM(llm, get_limiter("openai")))
+    papers = [{**paper, "title": f"{paper['title']} ({i})"} for i in range(4) for paper in fixture_papers()]
+    outline = generate_default_outline(papers)
+
+    start = time.perf_counter()
+    asyncio.run(agent.run_workflow(outline))
+    elapsed = time.perf_counter() - start
+    return elapsed, len(papers), {"llm": llm.calls, "query_engine": engine.calls}
+
+
+def bench_parse(config, workdir):
+    shutil.copytree(os.path.join(DATA_DIR, "papers"), os.path.join(workdir, "data", "papers"))
+    parser = FakeParser(latency=0.2 * config["latency_scale"], pages=12, failure_rate=config["failure_rate"], seed=config["seed"])
+    papers = fixture_papers() * 4  # repeats are fetched and parsed once, like re-selected papers
+
+    start = time.perf_counter()
+    documents = parse_and_cache_pdfs(papers, parser=parser)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(documents), {"parser": parser.calls}
+
+
+def bench_upload(config, workdir):
+    documents = fixture_documents(workdir)
+    llm = FakeLLM(latency=0.2 * config["latency_scale"], failure_rate=config["failure_rate"], seed=config["seed"])
+    client = FakeLlamaCloud(latency=0.1 * config["latency_scale"], failure_rate=config["failure_rate"], seed=config["seed"])
+    manifest = IngestManifest(os.path.join(workdir, "manifest.json"))
+
+    start = time.perf_counter()
+    uploaded = asyncio.run(upload_documents(documents, client=client, manifest=manifest, llm=RateLimitedLLM(llm, get_limiter("openai"))))
+    elapsed = time.perf_counter() - start
+    return elapsed, uploaded, {"llm": llm.calls, "cloud_documents": client.pipelines.documents_uploaded}
+
+
+def bench_fetch(config, workdir):
+    client = FakeArxivClient(latency=0.3 * config["latency_scale"], failure_rate=config["failure_rate"], seed=config["seed"])
+    arxiv_handler.MIN_REQUEST_INTERVAL = 0  # the fake has no rate limit to respect
+
+    start = time.perf_counter()
+    papers = arxiv_handler.fetch_papers("RAG, AI Agent, LLM, Retrieval, Multimodal", 10, client=client, use_cache=False)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(papers), {"arxiv": client.calls}
+
+
+SCENARIOS = {"workflow": bench_workflow, "parse": bench_parse, "upload": bench_upload, "fetch": bench_fetch}
+
+
+def run_once(scenario, config, trace_memory=False):
+    use_fast_limiters()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # src modules keep their caches under ./data
+        try:
+            if trace_memory:
+                tracemalloc.start()
+            elapsed, items, calls = scenario(config, workdir)
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            os.chdir(cwd)
+    return elapsed, items, calls, peak
+
+
+def run_scenario(scenario, config):
+    # untimed warm-up, so first-use imports and lazily built clients do not land in the first timed run
+    run_once(scenario, config)
+    runs = [run_once(scenario, config) for _ in range(config["repeat"])]
+    latencies = sorted(run[0] for run in runs)
+    *_, peak = run_once(scenario, config, trace_memory=True)  # kept apart so tracing does not skew timings
+    _, items, calls, _ = runs[-1]
+    return {
+        "p50": round(statistics.median(latencies), 4),
+        "p95": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 4),
+        "throughput": round(sum(run[1] for run in runs) / sum(latencies), 3),
+        "calls": sum(calls.values()),
+        "call_counts": calls,
+        "peak_mib": round(peak / 1024 / 1024, 2),
+    }
+
+
+def compare(name, result, baseline, tolerance):
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        if metric not in baseline or not baseline[metric]:
+            continue
+        change = (result[metric] - baseline[metric]) / baseline[metric]
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{name}.{metric}: {baseline[metric]} -> {result[metric]} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the report pipeline against deterministic fakes.")
+    parser.add_argument("--only", nargs="+", choices=sorted(SCENARIOS), help="Scenarios to run (default: all).")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario.")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for every fake backend latency.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability that a fake backend call fails with a 429.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression per metric.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline.")
+    args = parser.parse_args()
+
+    config = {"repeat": args.repeat, "latency_scale": args.latency_scale, "failure_rate": args.failure_rate, "seed": args.seed}
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}, running with {config}")
+
+    results = {}
+    regressions = []
+    failed = False
+    for name in args.only or SCENARIOS:
+        try:
+            result = run_scenario(SCENARIOS[name], config)
+        except ModuleNotFoundError as e:
+            print(f"{name:9s} skipped: {e}")
+            continue
+        except Exception as e:
+            print(f"{name:9s} FAILED: {e!r}")
+            failed = True
+            continue
+        results[name] = result
+        print(
+            f"{name:9s} p50 {result['p50']:.3f}s  p95 {result['p95']:.3f}s  {result['throughput']:.1f} items/s  "
+            f"calls {result['call_counts']}  peak {result['peak_mib']:.1f} MiB"
+        )
+        regressions += compare(name, result, baseline.get("scenarios", {}).get(name, {}), args.tolerance)
+
+    if args.save_baseline:
+        scenarios = {**baseline.get("scenarios", {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, "scenarios": scenarios}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+    if failed or (regressions and not args.save_baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Headless batch mode: generate one report per job in a batch file.
+
+The batch file is JSON (a list of jobs) or JSONL (one job per line). Each job looks like
+    {"name": "rag-digest", "tags": "RAG, AI Agent", "num_papers": 2, "outline": "..."}
+where "outline" is optional (the default outline for the fetched papers is used) and
+"index_backend" may be "cloud" (default) or "local", "parser_backend" "llamaparse" (default)
+or "local", and "react": true answers INDEX subsections with the ReAct agent.
+
+Usage:
+    python cli.py jobs.jsonl --output-dir reports --max-jobs 2 --max-llm-calls 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+from src.arxiv_handler import fetch_papers
+from src.instrumentation import tracer
+from src.outline_generator import generate_default_outline
+from src.pdf_handler import parse_and_cache_pdfs
+from src.llm_utils import get_llm
+from src.report_generator import ReportGenerationAgent, build_query_engine
+
+
+def load_batch(path):
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(".jsonl"):
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        jobs = json.loads(text)
+    for idx, job in enumerate(jobs, start=1):
+        job.setdefault("name", f"job-{idx}")
+        job.setdefault("num_papers", 2)
+        job.setdefault("index_backend", "cloud")
+        job.setdefault("parser_backend", "llamaparse")
+        job.setdefault("react", False)
+    return jobs
+
+
+def safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", name).strip("-") or "report"
+
+
+async def run_job(job, output_dir, job_slots, llm_calls):
+    async with job_slots:
+        timings = {}
+        papers = []
+        with tracer.span("cli_job", job=job["name"]) as root:
+            try:
+                start = time.perf_counter()
+                papers = await asyncio.to_thread(fetch_papers, job["tags"], job["num_papers"])
+                timings["fetch_papers"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                docs = await asyncio.to_thread(parse_and_cache_pdfs, papers, backend=job["parser_backend"])
+                timings["parse_and_cache_pdfs"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                query_engine = await build_query_engine(docs, job["index_backend"], react=job["react"])
+                timings["index"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                outline = job.get("outline") or generate_default_outline(papers)
+                agent = ReportGenerationAgent(query_engine, get_llm(), semaphore=llm_calls)
+                report = await agent.run_workflow(outline)
+                timings["run_workflow"] = time.perf_counter() - start
+
+                report_path = os.path.join(output_dir, f"{safe_name(job['name'])}.md")
+                with open(report_path, "w") as f:
+                    f.write(report)
+                status, error = "done", None
+            except Exception as e:
+                print(f"Job {job['name']} failed: {e}")
+                report_path, status, error = None, "failed", repr(e)
+
+    print(f"Job {job['name']}: {status} in {root.duration:.1f}s")
+    return {
+        "name": job["name"],
+        "status": status,
+        "error": error,
+        "papers": len(papers),
+        "report": report_path,
+        "seconds": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+        "total_seconds": round(root.duration, 3),
+        **tracer.totals(root),
+    }
+
+
+async def run_batch(jobs, output_dir, max_jobs, max_llm_calls):
+    os.makedirs(output_dir, exist_ok=True)
+    # one budget for the whole batch: at most max_jobs jobs and max_llm_calls answer/refine calls in flight
+    job_slots = asyncio.Semaphore(max_jobs)
+    llm_calls = asyncio.Semaphore(max_llm_calls)
+    return await asyncio.gather(*[run_job(job, output_dir, job_slots, llm_calls) for job in jobs])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate research reports for a batch of topics.")
+    parser.add_argument("batch_file", help="JSON or JSONL file of jobs")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--max-jobs", type=int, default=2, help="jobs running at once")
+    parser.add_argument("--max-llm-calls", type=int, default=8, help="LLM/query calls in flight across all jobs")
+    args = parser.parse_args()
+
+    jobs = load_batch(args.batch_file)
+    tracer.reset()
+    results = asyncio.run(run_batch(jobs, args.output_dir, args.max_jobs, args.max_llm_calls))
+
+    summary_path = os.path.join(args.output_dir, "summary.json")
+    with open(summary_path, "w") as f:
+        json.dump(results, f, indent=2)
+    tracer.export(os.path.join(args.output_dir, "trace.json"))
+
+    print(f"\n{'job':30s} {'status':8s} {'seconds':>8s} {'tokens':>8s} {'cost $':>8s}")
+    for result in results:
+        tokens = result["input_tokens"] + result["output_tokens"]
+        print(f"{result['name'][:30]:30s} {result['status']:8s} {result['total_seconds']:8.1f} {tokens:8d} {result['cost_usd']:8.4f}")
+    print(f"\nSummary written to {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
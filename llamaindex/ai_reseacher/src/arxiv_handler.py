@@ -1,13 +1,108 @@
-import arxiv
-def fetch_papers(tags, num_results):
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ARXIV_CACHE_DIR = "data/arxiv_cache"
+CACHE_TTL = 60 * 60  # seconds a cached search stays fresh
+MIN_REQUEST_INTERVAL = 3.0  # arXiv asks for no more than one API request every three seconds
+
+_client = None
+_rate_lock = threading.Lock()
+_last_request = 0.0
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import arxiv
+
+        _client = arxiv.Client(num_retries=3)
+    return _client
+
+
+def wait_for_rate_limit():
+    # space request starts across threads; responses can still overlap
+    global _last_request
+    with _rate_lock:
+        delay = _last_request + MIN_REQUEST_INTERVAL - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        _last_request = time.monotonic()
+
+
+def cache_path(tag, num_results, sort_by):
+    key = json.dumps([tag.lower(), num_results, str(sort_by)])
+    return f"{ARXIV_CACHE_DIR}/{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+
+def load_cached(path, ttl):
+    if not os.path.exists(path) or time.time() - os.path.getmtime(path) > ttl:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_cached(path, papers):
+    os.makedirs(ARXIV_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(papers, f)
+    os.replace(tmp_path, path)
+
+
+def search_tag(client, tag, num_results, sort_by):
+    import arxiv
+
+    wait_for_rate_limit()
+    search = arxiv.Search(query=tag, max_results=num_results, sort_by=sort_by)
     papers = []
-    for tag in tags.split(","):
-        search = arxiv.Search(query=tag.strip(), max_results=num_results, sort_by=arxiv.SortCriterion.SubmittedDate)
-        for result in search.results():
-            papers.append({
-                "id": result.entry_id,
-                "title": result.title,
-                "authors": ", ".join([author.name for author in result.authors]),
-                "url": result.pdf_url,
-            })
+    for result in client.results(search):
+        papers.append({
+            "id": result.entry_id,
+            "title": result.title,
+            "authors": ", ".join([author.name for author in result.authors]),
+            "url": result.pdf_url,
+        })
+    return papers
+
+
+def fetch_papers(tags, num_results, client=None, use_cache=True, cache_ttl=CACHE_TTL, max_workers=4):
+    """Search arXiv for each comma-separated tag concurrently and return papers in tag order,
+    without duplicates. Results per (tag, num_results, sort) are cached on disk for `cache_ttl`."""
+    import arxiv
+
+    client = client or get_client()
+    sort_by = arxiv.SortCriterion.SubmittedDate
+    tag_list = list(dict.fromkeys(tag.strip() for tag in tags.split(",") if tag.strip()))
+
+    results = {}
+    pending = []
+    for tag in tag_list:
+        cached = load_cached(cache_path(tag, num_results, sort_by), cache_ttl) if use_cache else None
+        if cached is not None:
+            results[tag] = cached
+        else:
+            pending.append(tag)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {tag: pool.submit(search_tag, client, tag, num_results, sort_by) for tag in pending}
+            for tag, future in futures.items():
+                try:
+                    results[tag] = future.result()
+                except Exception as e:
+                    print(f"Failed to fetch papers for '{tag}': {e}")
+                    continue
+                save_cached(cache_path(tag, num_results, sort_by), results[tag])
+
+    papers = []
+    seen = set()
+    for tag in tag_list:
+        for paper in results.get(tag, []):
+            if paper["id"] not in seen:
+                seen.add(paper["id"])
+                papers.append(paper)
     return papers
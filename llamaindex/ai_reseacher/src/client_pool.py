@@ -0,0 +1,47 @@
+"""API-key scoped clients.
+
+Clients are pooled per key in the registry, so every session using the same key reuses one client
+(and its HTTP connections) while sessions with different keys never share a client or rate
+limiter. A key of None means the process-wide key from the environment.
+Keys are identified by a short hash so raw keys never appear in registry keys or file names.
+"""
+import hashlib
+import os
+
+from src import registry
+
+
+def key_id(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else None
+
+
+def resolve_key(api_key, env_var):
+    """The explicit key, or the process-wide one from the environment"""
+    return api_key or os.environ[env_var]
+
+
+def get_client(kind, api_key, factory):
+    """Client of `kind` for `api_key`, built with `factory()` the first time the key is seen"""
+    return registry.get_or_create((kind, key_id(api_key)), factory)
+
+
+def discard_client(kind, api_key):
+    registry.discard((kind, key_id(api_key)))
+
+
+def get_openai_client(api_key=None):
+    def build():
+        import openai
+
+        return openai.OpenAI(api_key=resolve_key(api_key, "OPENAI_API_KEY"), max_retries=0)
+
+    return get_client("openai_client", api_key, build)
+
+
+def get_llama_cloud_client(api_key=None):
+    def build():
+        from llama_cloud.client import LlamaCloud
+
+        return LlamaCloud(token=resolve_key(api_key, "LLAMA_CLOUD_API_KEY"))
+
+    return get_client("llama_cloud", api_key, build)
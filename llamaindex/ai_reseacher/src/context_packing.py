@@ -0,0 +1,90 @@
+"""Token-aware packing of prompt context.
+
+Each prompt type has a token budget. Inputs that fit are passed through unchanged; inputs that do
+not are reduced with the cheapest method that keeps them useful: metadata extraction takes only as
+many leading pages as fit (authors and affiliations are on the first page), and section prompts
+either share the budget fairly between subsection answers or, when an LLM is given, are reduced
+map-reduce style by summarizing chunks until they fit.
+"""
+import asyncio
+
+from src.instrumentation import count_tokens
+
+PROMPT_BUDGETS = {
+    "metadata": 2000,
+    "section_summary": 3000,
+    "introduction": 3000,
+    "conclusion": 3000,
+}
+SUMMARIZE_PROMPT = "Summarize the following text concisely, keeping key facts, names and numbers:\n\n{text}"
+
+
+def truncate_to_tokens(text, budget):
+    if count_tokens(text) <= budget:
+        return text
+    try:
+        import tiktoken
+    except ImportError:
+        return text[: budget * 4]
+    encoding = tiktoken.get_encoding("o200k_base")
+    return encoding.decode(encoding.encode(text)[:budget])
+
+
+def fair_truncate(texts, budget):
+    """Truncate texts so together they fit the budget, never cutting a text shorter than its share"""
+    sizes = [count_tokens(text) for text in texts]
+    allowed = [0] * len(texts)
+    remaining = budget
+    order = sorted(range(len(texts)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(texts) - position)
+        allowed[i] = min(sizes[i], share)
+        remaining -= allowed[i]
+    return [text if allowed[i] == sizes[i] else truncate_to_tokens(text, allowed[i]) for i, text in enumerate(texts)]
+
+
+def metadata_context(document, budget=PROMPT_BUDGETS["metadata"], max_pages=3):
+    """Leading pages of a paper, stopping once the budget is reached"""
+    text = ""
+    for page in document[:max_pages]:
+        if count_tokens(text + page.text) > budget:
+            return text or truncate_to_tokens(page.text, budget)
+        text += page.text
+    return text
+
+
+def split_to_chunks(text, chunk_tokens):
+    paragraphs = text.split("\n")
+    chunks = []
+    current = ""
+    for paragraph in paragraphs:
+        candidate = f"{current}\n{paragraph}" if current else paragraph
+        if current and count_tokens(candidate) > chunk_tokens:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return [truncate_to_tokens(chunk, chunk_tokens) for chunk in chunks]
+
+
+async def summarize_to_budget(text, budget, llm, max_rounds=3):
+    """Map-reduce: summarize budget-sized chunks concurrently, repeating until the result fits"""
+    for _ in range(max_rounds):
+        if count_tokens(text) <= budget:
+            return text
+        chunks = split_to_chunks(text, budget)
+        summaries = await asyncio.gather(*[llm.acomplete(SUMMARIZE_PROMPT.format(text=chunk)) for chunk in chunks])
+        text = "\n".join(str(summary) for summary in summaries)
+    return truncate_to_tokens(text, budget)
+
+
+async def apack(texts, budget, llm=None, separator="\n"):
+    """Join texts into at most `budget` tokens; unchanged when they already fit"""
+    joined = separator.join(texts)
+    if count_tokens(joined) <= budget:
+        return joined
+    if llm is None:
+        return separator.join(fair_truncate(texts, budget))
+    return await summarize_to_budget(joined, budget, llm)
@@ -0,0 +1,165 @@
+"""Versioned on-disk store for parsed papers.
+
+Each paper is a single JSONL file: the first line is an index header, every following line is one
+parsed page. The header records the format version, the SHA-256 of the source PDF, a hash of the
+parser settings and the byte offset of every page, so a paper can be validated and individual
+pages read without loading the rest of the file.
+
+Migrate legacy pickles with:
+    python -m src.doc_store migrate [--remove]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections.abc import Sequence
+
+STORE_VERSION = 1
+PAPERS_DIR = "data/papers"
+PARSED_DOCS_DIR = "data/parsed_docs"
+# settings LlamaParse has always been run with in this project, used for migrated pickles
+LLAMA_PARSE_SETTINGS = {"parser": "LlamaParse", "result_type": "markdown"}
+
+
+def store_path(paper_id):
+    return f"{PARSED_DOCS_DIR}/{paper_id}.jsonl"
+
+
+def settings_key(settings):
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pdf_fingerprint(pdf_path):
+    if not os.path.exists(pdf_path):
+        return None
+    stat = os.stat(pdf_path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+class LazyDocument(Sequence):
+    """Read-only list of page Documents that are only read from disk when indexed"""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.paper_id = header["paper_id"]
+        self.content_hash = header["content_hash"]
+
+    def __len__(self):
+        return len(self.header["offsets"])
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        from llama_index.core import Document
+
+        offset = self.header["offsets"][idx]
+        with open(self.path, "rb") as f:
+            f.seek(self.header["body_start"] + offset)
+            page = json.loads(f.readline())
+        return Document(text=page["text"], metadata=page["metadata"])
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        line = f.readline()
+        header = json.loads(line)
+    header["body_start"] = len(line)
+    return header
+
+
+def load(paper_id, pdf_path, settings):
+    """Return a LazyDocument for the paper, or None if it is missing or stale"""
+    path = store_path(paper_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        header = read_header(path)
+    except (OSError, ValueError):
+        return None
+    if header.get("version") != STORE_VERSION or header.get("parser_key") != settings_key(settings):
+        return None
+
+    # migrated entries may have no PDF hash; trust them until they are re-parsed
+    if header.get("pdf_sha256") is not None:
+        fingerprint = pdf_fingerprint(pdf_path)
+        if fingerprint is None:
+            return None
+        if fingerprint != header.get("pdf_fingerprint") and file_sha256(pdf_path) != header["pdf_sha256"]:
+            return None
+    return LazyDocument(path, header)
+
+
+def save(paper_id, pages, pdf_path, settings):
+    """Write parsed pages to the store and return them as a LazyDocument"""
+    lines = [
+        (json.dumps({"text": page.text, "metadata": page.metadata}) + "\n").encode("utf-8")
+        for page in pages
+    ]
+    offsets = []
+    position = 0
+    for line in lines:
+        offsets.append(position)
+        position += len(line)
+
+    pdf_sha256 = file_sha256(pdf_path) if pdf_path and os.path.exists(pdf_path) else None
+    header = {
+        "version": STORE_VERSION,
+        "paper_id": paper_id,
+        "pdf_sha256": pdf_sha256,
+        "pdf_fingerprint": pdf_fingerprint(pdf_path) if pdf_sha256 else None,
+        "parser_key": settings_key(settings),
+        "content_hash": hashlib.sha256(b"".join(lines)).hexdigest(),
+        "offsets": offsets,
+    }
+
+    os.makedirs(PARSED_DOCS_DIR, exist_ok=True)
+    path = store_path(paper_id)
+    # per-writer temp file: two jobs may parse the same paper at once
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write((json.dumps(header) + "\n").encode("utf-8"))
+        f.writelines(lines)
+    os.replace(tmp_path, path)
+    return LazyDocument(path, read_header(path))
+
+
+def migrate_pickle(pkl_path, remove=False):
+    paper_id = os.path.basename(pkl_path)[: -len(".pkl")]
+    with open(pkl_path, "rb") as f:
+        pages = pickle.load(f)
+    document = save(paper_id, pages, f"{PAPERS_DIR}/{paper_id}.pdf", LLAMA_PARSE_SETTINGS)
+    if remove:
+        os.remove(pkl_path)
+    return document
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the parsed document store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Convert legacy .pkl parse caches to the JSONL store.")
+    migrate.add_argument("--remove", action="store_true", help="Delete each .pkl after it is migrated.")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        for pkl_path in sorted(glob.glob(f"{PARSED_DOCS_DIR}/*.pkl")):
+            try:
+                document = migrate_pickle(pkl_path, remove=args.remove)
+                print(f"Migrated {pkl_path} ({len(document)} pages)")
+            except Exception as e:
+                print(f"Failed to migrate {pkl_path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Streaming chunk -> embed -> store pipeline for local ingestion.
+
+Papers are read page by page (LazyDocument only loads the page being chunked), cut into
+overlapping word windows by a generator, de-duplicated by content hash, embedded in fixed-size
+batches and appended to a float32 vector file. At most one batch of chunk texts and vectors is held
+in memory at a time, so ingest memory does not grow with the number of papers.
+
+Embedders are pluggable: anything with a `dim` attribute and `embed(texts)` returning an
+(n, dim) float32 array of unit vectors.
+"""
+import hashlib
+import json
+import os
+from array import array
+
+import numpy as np
+
+from src.instrumentation import count_tokens
+from src.rate_limiter import get_limiter
+
+
+def stream_chunks(pages, chunk_size=1024, chunk_overlap=20):
+    """Yield word windows of `chunk_size` words overlapping by `chunk_overlap`, continuing across
+    page boundaries like the cloud pipeline does on the uploaded full text"""
+    step = max(chunk_size - chunk_overlap, 1)
+    window = []
+    fresh = 0  # words in the window not yet part of an emitted chunk
+    for page in pages:
+        for word in page.text.split():
+            window.append(word)
+            fresh += 1
+            if len(window) == chunk_size:
+                yield " ".join(window)
+                window = window[step:]
+                fresh = 0
+    if fresh:
+        yield " ".join(window)
+
+
+def chunk_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class VectorStore:
+    """Append-only float32 vectors (`embeddings.f32`) with one JSON record per row
+    (`chunks.jsonl`). Only byte offsets and hashes stay in memory; records are read on demand."""
+
+    def __init__(self, path, dim):
+        self.path = path
+        self.dim = dim
+        self.offsets = array("q")
+        self.hash_rows = {}
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def vectors_path(self):
+        return os.path.join(self.path, "embeddings.f32")
+
+    @property
+    def records_path(self):
+        return os.path.join(self.path, "chunks.jsonl")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def scan(self):
+        """Load offsets and hashes from disk, yielding (row, record) for every stored chunk"""
+        if not os.path.exists(self.records_path):
+            return
+        position = 0
+        with open(self.records_path, "rb") as f:
+            for row, line in enumerate(f):
+                record = json.loads(line)
+                self.offsets.append(position)
+                self.hash_rows.setdefault(record.get("hash") or chunk_hash(record["text"]), row)
+                position += len(line)
+                yield row, record
+
+    def record(self, row):
+        with open(self.records_path, "rb") as f:
+            f.seek(self.offsets[row])
+            return json.loads(f.readline())
+
+    def matrix(self):
+        if not self.offsets:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.offsets), self.dim))
+
+    def append(self, records, vectors):
+        """Write a batch and return the rows it was stored at"""
+        first_row = len(self.offsets)
+        position = os.path.getsize(self.records_path) if os.path.exists(self.records_path) else 0
+        lines = [(json.dumps(record) + "\n").encode("utf-8") for record in records]
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self.records_path, "ab") as f:
+            f.writelines(lines)
+        for record, line in zip(records, lines):
+            self.hash_rows[record["hash"]] = len(self.offsets)
+            self.offsets.append(position)
+            position += len(line)
+        return list(range(first_row, len(self.offsets)))
+
+    def compact(self, rows, batch_size=1024):
+        """Rewrite the store keeping only `rows` (in that order) and return {old row: new row}.
+        Call `scan()` afterwards to reload offsets and hashes."""
+        vectors = self.matrix()
+        with open(self.records_path, "rb") as records, \
+                open(f"{self.vectors_path}.compact", "wb") as vectors_out, \
+                open(f"{self.records_path}.compact", "wb") as records_out:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                vectors_out.write(np.ascontiguousarray(vectors[batch], dtype=np.float32).tobytes())
+                for row in batch:
+                    records.seek(self.offsets[row])
+                    records_out.write(records.readline())
+        del vectors  # release the memmap before its file is replaced
+        os.replace(f"{self.vectors_path}.compact", self.vectors_path)
+        os.replace(f"{self.records_path}.compact", self.records_path)
+        self.offsets = array("q")
+        self.hash_rows = {}
+        return {row: new_row for new_row, row in enumerate(rows)}
+
+
+class EmbeddingPipeline:
+    def __init__(self, embedder, store, batch_size=64):
+        self.embedder = embedder
+        self.store = store
+        self.batch_size = batch_size
+        self.embedded = 0
+        self.duplicates = 0
+
+    def ingest(self, chunks, metadata):
+        """Store each chunk text not already in the store. Yields (row, text, is_new) for every
+        chunk in input order, one batch at a time."""
+        batch = []  # (hash, text) to embed
+        queued = set()
+        output = []  # (hash, text, is_new) in input order
+        for text in chunks:
+            digest = chunk_hash(text)
+            is_new = digest not in self.store.hash_rows and digest not in queued
+            if is_new:
+                batch.append((digest, text))
+                queued.add(digest)
+            else:
+                self.duplicates += 1
+            output.append((digest, text, is_new))
+            if len(batch) == self.batch_size or len(output) >= 4 * self.batch_size:
+                yield from self.flush(batch, output, metadata)
+                batch, queued, output = [], set(), []
+        yield from self.flush(batch, output, metadata)
+
+    def flush(self, batch, output, metadata):
+        if batch:
+            vectors = self.embedder.embed([text for _, text in batch])
+            self.store.append([{"text": text, "metadata": metadata, "hash": digest} for digest, text in batch], vectors)
+            self.embedded += len(batch)
+        for digest, text, is_new in output:
+            yield self.store.hash_rows[digest], text, is_new
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings (the model the cloud pipeline uses), paced by the key's OpenAI limiter"""
+
+    def __init__(self, model="text-embedding-ada-002", dim=1536, api_key=None):
+        self.model = model
+        self.dim = dim
+        self.api_key = api_key
+        self._client = None
+
+    def embed(self, texts):
+        if self._client is None:
+            from llama_index.embeddings.openai import OpenAIEmbedding
+
+            self._client = OpenAIEmbedding(model=self.model, api_key=self.api_key, max_retries=0)
+        tokens = sum(count_tokens(text) for text in texts)
+        vectors = np.asarray(
+            get_limiter("openai", self.api_key).call(self._client.get_text_embedding_batch, texts, tokens=tokens),
+            dtype=np.float32,
+        )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+
+from src import registry
+
+MANIFEST_PATH = "data/ingest_manifest.json"
+
+
+def config_hash(*configs):
+    return hashlib.sha256(json.dumps(configs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def document_key(document):
+    """Return (paper_id, content_hash) for a parsed paper (a list of page Documents)"""
+    content_hash = getattr(document, "content_hash", None)
+    if content_hash is None:
+        digest = hashlib.sha256()
+        for page in document:
+            digest.update(page.text.encode("utf-8"))
+        content_hash = digest.hexdigest()
+    paper_id = getattr(document, "paper_id", None) or content_hash[:16]
+    return paper_id, content_hash
+
+
+class IngestManifest:
+    """Local record of what has been ingested into each cloud pipeline:
+    pipeline config hash and id, paper id -> content hash -> cloud document id, and the
+    pipeline's partitions (see src.partitions).
+
+    Concurrent uploads in a process share one instance (see get_manifest) and hold `lock` while
+    they update it. `save` merges in what other processes wrote since the file was loaded."""
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.data = {"pipelines": {}}
+        self.lock = threading.RLock()
+        self.forgotten = set()  # (name, paper id) removed here, not to be merged back from disk
+        self.expired = set()  # (name, partition id) expired here
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    def pipeline(self, name):
+        entry = self.data["pipelines"].setdefault(name, {"config_hash": None, "pipeline_id": None, "documents": {}})
+        entry.setdefault("partitions", {})
+        return entry
+
+    def partitions(self, name):
+        return self.pipeline(name)["partitions"]
+
+    def pipeline_id(self, name, config):
+        entry = self.pipeline(name)
+        return entry["pipeline_id"] if entry["config_hash"] == config else None
+
+    def set_pipeline(self, name, config, pipeline_id):
+        entry = self.pipeline(name)
+        if entry["pipeline_id"] != pipeline_id:
+            # a different pipeline holds none of the documents we recorded
+            entry["documents"] = {}
+        entry.update({"config_hash": config, "pipeline_id": pipeline_id})
+
+    def is_current(self, name, paper_id, content_hash, schema=1):
+        # `schema` versions what is uploaded besides the text, such as the document metadata
+        record = self.pipeline(name)["documents"].get(paper_id)
+        return record is not None and record["content_hash"] == content_hash and record.get("schema", 1) == schema
+
+    def record(self, name, paper_id, content_hash, document_id, schema=1):
+        self.pipeline(name)["documents"][paper_id] = {"content_hash": content_hash, "document_id": document_id, "schema": schema}
+
+    def forget(self, name, paper_id):
+        self.forgotten.add((name, paper_id))
+        return self.pipeline(name)["documents"].pop(paper_id, None)
+
+    def expire_partitions(self, name, ttl):
+        from src import partitions
+
+        expired = partitions.expire(self.partitions(name), ttl)
+        self.expired.update((name, partition) for partition in expired)
+        return expired
+
+    def index_version(self, name, paper_ids=None):
+        """Changes whenever the pipeline config or any ingested document changes; with `paper_ids`
+        only changes to those documents count"""
+        entry = self.pipeline(name)
+        documents = entry["documents"]
+        if paper_ids is not None:
+            documents = {paper_id: documents.get(paper_id) for paper_id in sorted(set(paper_ids))}
+        return config_hash(entry["config_hash"], documents)
+
+    def merge(self, data):
+        """Add documents and partitions from `data` (another writer's manifest) that this instance
+        does not have and did not remove itself"""
+        for name, other in data.get("pipelines", {}).items():
+            entry = self.pipeline(name)
+            if entry["pipeline_id"] is None:
+                entry.update({key: other.get(key) for key in ("config_hash", "pipeline_id")})
+            elif other.get("pipeline_id") != entry["pipeline_id"]:
+                continue  # records of a pipeline this instance has replaced
+            for paper_id, record in other.get("documents", {}).items():
+                if paper_id not in entry["documents"] and (name, paper_id) not in self.forgotten:
+                    entry["documents"][paper_id] = record
+            for partition, other_entry in other.get("partitions", {}).items():
+                current = entry["partitions"].get(partition)
+                if current is not None:
+                    current["last_used"] = max(current["last_used"], other_entry["last_used"])
+                elif (name, partition) not in self.expired:
+                    entry["partitions"][partition] = other_entry
+
+    def save(self):
+        with self.lock:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    self.merge(json.load(f))
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}-{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.data, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def get_manifest(path=MANIFEST_PATH):
+    """One manifest instance per path, shared by every upload in the process"""
+    return registry.get_or_create(("ingest_manifest", os.path.abspath(path)), lambda: IngestManifest(path))
@@ -0,0 +1,232 @@
+"""Lightweight tracing for the report pipeline.
+
+Spans are recorded for each pipeline stage and each LLM / query engine call, LLM spans carry token
+counts and an estimated cost, and the collected trace can be summarised per stage or exported as
+an OTLP-shaped JSON file that OpenTelemetry collectors and Phoenix can import.
+
+`tracer` records into the tracer of the current context: the process-wide one unless code runs
+under `use_tracer`, which gives concurrent jobs separate traces.
+"""
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACES_DIR = "data/traces"
+# USD per 1M tokens (input, output)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_tracer = contextvars.ContextVar("current_tracer", default=None)
+_encodings = {}
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    try:
+        import tiktoken
+    except ImportError:  # fall back to a character-based estimate
+        return max(len(text) // 4, 1) if text else 0
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return len(_encodings[model].encode(text))
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class Span:
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self.end_time = None
+
+    @property
+    def duration(self):
+        return (self.end_time or time.time()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.time()
+            self.tracer.finish(self)
+
+
+class Tracer:
+    def __init__(self):
+        self.spans = []
+        self.trace_id = secrets.token_hex(16)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.trace_id = secrets.token_hex(16)
+
+    def start_span(self, name, **attributes):
+        """Start a span under the current one without making it current; call .end() when done.
+        Use this for work that spans generator yields."""
+        return Span(self, name, _current_span.get(), attributes)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=repr(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def record_llm_call(self, span, model, prompt, completion, cached):
+        input_tokens = count_tokens(prompt, model)
+        output_tokens = count_tokens(completion, model)
+        span.set(
+            model=model,
+            cached=cached,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            # cache hits cost nothing
+            cost_usd=0.0 if cached else estimate_cost(model, input_tokens, output_tokens),
+        )
+
+    def summary(self):
+        """One row per span name with call counts, latency, tokens and cost"""
+        rows = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            row = rows.setdefault(span.name, {"stage": span.name, "calls": 0, "durations": [], "tokens": 0, "cost_usd": 0.0, "cache_hits": 0})
+            row["calls"] += 1
+            row["durations"].append(span.duration)
+            row["tokens"] += span.attributes.get("input_tokens", 0) + span.attributes.get("output_tokens", 0)
+            row["cost_usd"] += span.attributes.get("cost_usd", 0.0)
+            row["cache_hits"] += 1 if span.attributes.get("cached") else 0
+
+        summary = []
+        for row in rows.values():
+            durations = sorted(row.pop("durations"))
+            summary.append({
+                **row,
+                "total_s": round(sum(durations), 3),
+                "p50_s": round(durations[len(durations) // 2], 3),
+                "p95_s": round(durations[min(int(len(durations) * 0.95), len(durations) - 1)], 3),
+                "cache_hit_rate": round(row["cache_hits"] / row["calls"], 3),
+                "cost_usd": round(row["cost_usd"], 6),
+            })
+        return sorted(summary, key=lambda row: -row["total_s"])
+
+    def totals(self, root):
+        """Token, cost and LLM call totals for every span under `root`"""
+        with self._lock:
+            spans = list(self.spans)
+        children = {}
+        for span in spans:
+            children.setdefault(span.parent_id, []).append(span)
+        totals = {"llm_calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+        stack = list(children.get(root.span_id, []))
+        while stack:
+            span = stack.pop()
+            stack.extend(children.get(span.span_id, []))
+            if "input_tokens" in span.attributes:
+                totals["llm_calls"] += 1
+                totals["input_tokens"] += span.attributes["input_tokens"]
+                totals["output_tokens"] += span.attributes["output_tokens"]
+                totals["cost_usd"] += span.attributes["cost_usd"]
+        return totals
+
+    def to_otlp(self):
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {"key": key, "value": {"boolValue": value}}
+            if isinstance(value, int):
+                return {"key": key, "value": {"intValue": str(value)}}
+            if isinstance(value, float):
+                return {"key": key, "value": {"doubleValue": value}}
+            return {"key": key, "value": {"stringValue": str(value)}}
+
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [attribute("service.name", "ai-researcher")]},
+                "scopeSpans": [{
+                    "scope": {"name": "src.instrumentation"},
+                    "spans": [
+                        {
+                            "traceId": self.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "startTimeUnixNano": str(int(span.start * 1e9)),
+                            "endTimeUnixNano": str(int(span.end_time * 1e9)),
+                            "attributes": [attribute(key, value) for key, value in span.attributes.items()],
+                        }
+                        for span in spans
+                    ],
+                }],
+            }]
+        }
+
+    def export(self, path=None):
+        path = path or f"{TRACES_DIR}/trace-{self.trace_id}.json"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_otlp(), f, indent=2)
+        return path
+
+
+_process_tracer = Tracer()
+
+
+def current_tracer():
+    return _current_tracer.get() or _process_tracer
+
+
+@contextmanager
+def use_tracer(scoped=None):
+    """Record spans of the enclosed code (including tasks and threads started with its context)
+    into `scoped`, a new Tracer by default, as a separate trace. Do not hold it across `yield` in
+    an async generator: each step may run in a different context, and the reset would fail."""
+    scoped = scoped or Tracer()
+    tracer_token = _current_tracer.set(scoped)
+    span_token = _current_span.set(None)
+    try:
+        yield scoped
+    finally:
+        _current_span.reset(span_token)
+        _current_tracer.reset(tracer_token)
+
+
+class CurrentTracer:
+    """Module-level `tracer`: forwards to the tracer of the current context"""
+
+    def __getattr__(self, name):
+        return getattr(current_tracer(), name)
+
+
+tracer = CurrentTracer()
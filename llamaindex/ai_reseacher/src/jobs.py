@@ -0,0 +1,219 @@
+"""Background report jobs.
+
+A job (selected papers + outline) runs on a shared worker pool instead of inside the Streamlit
+script run. Its progress and intermediate results (queries, section contents, finished report
+sections) are persisted under data/jobs/<job id>/ so a job interrupted by a crash resumes from the
+last completed stage; parsed papers and uploads are already cached by doc_store and the ingest
+manifest.
+
+API keys given to `submit` are held in memory for the job's lifetime only and never written to the
+job directory. A job resumed after a restart runs with the keys from the environment, unless it
+was submitted with session keys: those would bill another account and read another project's
+records, so such a job is marked failed instead and has to be submitted again.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from src import report_generator
+from src.instrumentation import tracer, use_tracer
+from src.llm_utils import get_llm
+from src.pdf_handler import parse_and_cache_pdfs
+from src.report_generator import ReportGenerationAgent
+
+JOBS_DIR = "data/jobs"
+STAGES = ["parse", "index", "plan", "sections", "format"]
+
+
+class JobManager:
+    def __init__(self, max_concurrent_jobs=2, jobs_dir=JOBS_DIR, parse_fn=None, query_engine_fn=None, llm=None):
+        self.jobs_dir = jobs_dir
+        # backends are injectable so jobs can run against fakes
+        self.parse_fn = parse_fn or parse_and_cache_pdfs
+        self.query_engine_fn = query_engine_fn or report_generator.build_query_engine
+        self.llm = llm
+        self.credentials = {}  # job id -> {"openai_api_key": ..., "llama_cloud_api_key": ...}
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="report-job")
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def path(self, job_id, name):
+        return os.path.join(self.job_dir(job_id), name)
+
+    def write_json(self, job_id, name, data):
+        path = self.path(job_id, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def read_json(self, job_id, name, default=None):
+        path = self.path(job_id, name)
+        if not os.path.exists(path):
+            return default
+        with open(path) as f:
+            return json.load(f)
+
+    def get(self, job_id):
+        return self.read_json(job_id, "state.json")
+
+    def update(self, job_id, **changes):
+        with self._lock:
+            state = self.get(job_id)
+            state.update(changes)
+            state["updated"] = time.time()
+            self.write_json(job_id, "state.json", state)
+            return state
+
+    def set_stage(self, job_id, stage, status, **extra):
+        with self._lock:
+            state = self.get(job_id)
+            state["stage"] = stage
+            state["stages"][stage] = {**state["stages"].get(stage, {}), "status": status, **extra}
+            state["updated"] = time.time()
+            self.write_json(job_id, "state.json", state)
+
+    def list_jobs(self):
+        jobs = [self.get(job_id) for job_id in os.listdir(self.jobs_dir) if os.path.exists(self.path(job_id, "state.json"))]
+        return sorted(jobs, key=lambda job: job["created"], reverse=True)
+
+    def submit(
+        self, papers, outline, index_backend="cloud", parser_backend="llamaparse", react=False,
+        openai_api_key=None, llama_cloud_api_key=None,
+    ):
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        self.credentials[job_id] = {"openai_api_key": openai_api_key or None, "llama_cloud_api_key": llama_cloud_api_key or None}
+        session_credentials = any(self.credentials[job_id].values())
+        now = time.time()
+        self.write_json(job_id, "state.json", {
+            "id": job_id,
+            "status": "queued",
+            "stage": None,
+            "stages": {stage: {"status": "pending"} for stage in STAGES},
+            "papers": papers,
+            "outline": outline,
+            "index_backend": index_backend,
+            "parser_backend": parser_backend,
+            "react": react,
+            "session_credentials": session_credentials,  # whether keys were given, never the keys
+            "report_sections": [],
+            "error": None,
+            "created": now,
+            "updated": now,
+        })
+        self.pool.submit(self.run, job_id)
+        return job_id
+
+    def resume_incomplete(self):
+        """Requeue jobs that were queued or running when the process stopped"""
+        resumed = []
+        for job in self.list_jobs():
+            if job["status"] not in ("queued", "running"):
+                continue
+            if job.get("session_credentials"):
+                # the session's keys died with the process; never fall back to the environment's
+                self.update(job["id"], status="failed", error="Interrupted by a restart. Enter your API keys and submit the report again.")
+            else:
+                self.update(job["id"], status="queued")
+                self.pool.submit(self.run, job["id"])
+                resumed.append(job["id"])
+        return resumed
+
+    def run(self, job_id):
+        # each worker thread drives its own event loop and records its own trace
+        loop = asyncio.new_event_loop()
+        status, error = "done", None
+        with use_tracer() as job_tracer:
+            try:
+                self.update(job_id, status="running")
+                loop.run_until_complete(self.execute(job_id))
+            except Exception as e:
+                traceback.print_exc()
+                status, error = "failed", repr(e)
+            finally:
+                self.credentials.pop(job_id, None)
+                loop.close()
+                job_tracer.export(self.path(job_id, "trace.json"))
+        self.update(job_id, status=status, error=error, timings=job_tracer.summary())
+
+    @contextmanager
+    def stage(self, job_id, name):
+        start = time.perf_counter()
+        self.set_stage(job_id, name, "running")
+        try:
+            with tracer.span(name, job_id=job_id):
+                yield
+        except BaseException as e:
+            # cancelled or failed: the progress view must not show the stage as still running
+            self.set_stage(job_id, name, "failed", seconds=round(time.perf_counter() - start, 3), error=repr(e))
+            raise
+        self.set_stage(job_id, name, "done", seconds=round(time.perf_counter() - start, 3))
+
+    async def execute(self, job_id):
+        state = self.get(job_id)
+        keys = self.credentials.get(job_id, {})
+
+        with self.stage(job_id, "parse"):
+            docs = self.parse_fn(
+                state["papers"], backend=state.get("parser_backend", "llamaparse"), api_key=keys.get("llama_cloud_api_key")
+            )
+
+        with self.stage(job_id, "index"):
+            query_engine = await self.query_engine_fn(docs, state["index_backend"], react=state.get("react", False), **keys)
+        agent = ReportGenerationAgent(query_engine, self.llm or get_llm(api_key=keys.get("openai_api_key")))
+
+        queries = self.read_json(job_id, "queries.json")
+        if queries is not None:
+            self.set_stage(job_id, "plan", "done", resumed=True)
+        else:
+            with self.stage(job_id, "plan"):
+                queries = agent.parse_outline_and_generate_queries(state["outline"])
+                self.write_json(job_id, "queries.json", queries)
+
+        sections_content = self.read_json(job_id, "sections_content.json")
+        if sections_content is not None:
+            self.set_stage(job_id, "sections", "done", resumed=True)
+        else:
+            with self.stage(job_id, "sections"):
+                sections_content = await agent.agenerate_section_content(queries)
+                self.write_json(job_id, "sections_content.json", sections_content)
+
+        with self.stage(job_id, "format"):
+            sections = []
+            self.update(job_id, report_sections=sections)
+            async for section in agent.astream_report(sections_content, state["outline"]):
+                sections.append(section)
+                self.update(job_id, report_sections=sections)
+            with open(self.path(job_id, "report.md"), "w") as f:
+                f.write("".join(sections))
+
+    def report(self, job_id):
+        path = self.path(job_id, "report.md")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager(max_concurrent_jobs=2):
+    """Process-wide manager, so the job cap applies across all Streamlit sessions"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(max_concurrent_jobs=max_concurrent_jobs)
+            _manager.resume_incomplete()
+    return _manager
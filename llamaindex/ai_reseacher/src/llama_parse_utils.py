@@ -1,41 +1,48 @@
-from llama_cloud.types import CloudDocumentCreate
+import asyncio
 from pydantic import BaseModel, Field
 from typing import List
-from llama_cloud.client import LlamaCloud
-from llama_index.core.prompts import PromptTemplate
-from llama_index.core.async_utils import run_jobs
-import os
-from src.llm_utils import get_llm
-from llama_parse import LlamaParse
-from llama_index.indices.managed.llama_cloud import LlamaCloudIndex
+from src.client_pool import get_client, get_llama_cloud_client, resolve_key
+from src.llm_utils import get_llm, get_openai_llm
+from src.ingest_manifest import config_hash, document_key, get_manifest
+from src.context_packing import metadata_context
+from src import partitions
+from src.rate_limiter import RateLimitedQueryEngine, get_limiter, status_code
 
+# llama_cloud, llama_parse and the LlamaCloud index are imported where they are used, so
+# importing this module does not pay for those SDKs or require API keys to be set
 
-llm = get_llm()
 
+def get_embedding_config(openai_api_key=None):
+    return {
+        "type": "OPENAI_EMBEDDING",
+        "component": {
+            "api_key": resolve_key(openai_api_key, "OPENAI_API_KEY"),  # editable
+            "model_name": "text-embedding-ada-002",  # editable
+        },
+    }
 
-embedding_config = {
-    "type": "OPENAI_EMBEDDING",
-    "component": {
-        "api_key": os.environ["OPENAI_API_KEY"],  # editable
-        "model_name": "text-embedding-ada-002",  # editable
-    },
-}
+# one pipeline per project; reports retrieve from their own papers through metadata filters
+PIPELINE_NAME = "new_index"
+PROJECT_NAME = "Default"
+# 2: document metadata carries paper_id, which retrieval filters on
+DOCUMENT_SCHEMA = 2
 
 # Transformation auto config
 transform_config = {"mode": "auto", "config": {"chunk_size": 1024, "chunk_overlap": 20}}
 
 
-def parse_pdf(pdf_files):
-    llama_parse = LlamaParse(
-        result_type="markdown",
-        num_workers=4,  # if multiple files passed, split in `num_workers` API calls
-        verbose=True,
-    )
+def parse_pdf(pdf_files, backend="llamaparse", api_key=None):
+    from src.parsers import get_parser
+
+    parser = get_parser(backend, num_workers=4, api_key=api_key)
     documents = []
 
     for i, pdf_file in enumerate(pdf_files):
         print(f"Processing {i+1/len(pdf_files)}: ", {pdf_file})
-        document = llama_parse.load_data(pdf_file)
+        if getattr(parser, "remote", True):
+            document = get_limiter("llamaparse", api_key).call(parser.load_data, pdf_file)
+        else:
+            document = parser.load_data(pdf_file)
         documents.append(document)
     return documents
 
@@ -55,21 +62,62 @@ class Metadata(BaseModel):
     )
 
 
+def get_project_id(api_key=None, client=None):
+    """Id of the Llama Cloud project holding the index, looked up once per key"""
+
+    def lookup():
+        projects = get_limiter("llamacloud", api_key).call(
+            (client or get_llama_cloud_client(api_key)).projects.list_projects, project_name=PROJECT_NAME
+        )
+        if not projects:
+            raise ValueError(f"No Llama Cloud project named {PROJECT_NAME!r} for this API key")
+        return projects[0].id
+
+    return get_client(("llama_cloud_project", PROJECT_NAME), api_key, lookup)
+
+
+def record_name(pipeline_name=PIPELINE_NAME, api_key=None, client=None):
+    # pipelines belong to a project that several keys can reach (including the environment key
+    # entered again in the app), so manifest records and partitions are kept per project
+    return f"{pipeline_name}@{get_project_id(api_key, client)}"
+
+
 def create_llamacloud_pipeline(
-    pipeline_name, embedding_config, transform_config, data_sink_id=None
+    pipeline_name, embedding_config, transform_config, data_sink_id=None, client=None, api_key=None
 ):
-    client = LlamaCloud(token=os.environ["LLAMA_CLOUD_API_KEY"])
+    client = client or get_llama_cloud_client(api_key)
     pipeline = {
         "name": pipeline_name,
         "embedding_config": embedding_config,
         "transform_config": transform_config,
         "data_sink_id": data_sink_id,
     }
-    pipeline = client.pipelines.upsert_pipeline(request=pipeline)
+    pipeline = get_limiter("llamacloud", api_key).call(
+        client.pipelines.upsert_pipeline, project_id=get_project_id(api_key, client), request=pipeline
+    )
     return client, pipeline
 
 
-async def get_papers_metadata(text):
+def get_pipeline_id(
+    client, manifest, pipeline_name, embedding_config, transform_config, data_sink_id=None, api_key=None
+):
+    # only upsert the pipeline when its configuration changed since the last run
+    manifest_name = record_name(pipeline_name, api_key, client)
+    config = config_hash(pipeline_name, embedding_config, transform_config, data_sink_id)
+    pipeline_id = manifest.pipeline_id(manifest_name, config)
+    if pipeline_id is None:
+        _, pipeline = create_llamacloud_pipeline(
+            pipeline_name, embedding_config, transform_config, data_sink_id, client=client, api_key=api_key
+        )
+        pipeline_id = pipeline.id
+        manifest.set_pipeline(manifest_name, config, pipeline_id)
+    return pipeline_id
+
+
+async def get_papers_metadata(text, llm=None):
+    from llama_index.core.prompts import PromptTemplate
+
+    llm = llm or get_llm()
     prompt_template = PromptTemplate(
         """Generate authors names, authors companies, and general top 3 AI tags for the given research paper.
 
@@ -86,14 +134,18 @@ async def get_papers_metadata(text):
     return metadata
 
 
-async def get_document_upload(document, llm):
-    text_for_metadata = document[0].text + document[1].text + document[2].text
-    metadata = await get_papers_metadata(text_for_metadata)
+async def get_document_upload(document, llm, document_id=None):
+    from llama_cloud.types import CloudDocumentCreate
+
+    text_for_metadata = metadata_context(document)
+    metadata = await get_papers_metadata(text_for_metadata, llm=llm)
     full_text = "\n\n".join([doc.text for doc in document])
 
     cloud_document = CloudDocumentCreate(
+        id=document_id,
         text=full_text,
         metadata={
+            "paper_id": document_id,
             "author_names": metadata.author_names,
             "author_companies": metadata.author_companies,
             "ai_tags": metadata.ai_tags,
@@ -102,34 +154,125 @@ async def get_document_upload(document, llm):
     return cloud_document
 
 
-async def upload_documents(documents):
-    extract_jobs = []
-    for document in documents:
-        extract_jobs.append(get_document_upload(document, llm))
-    document_upload_objs = await run_jobs(extract_jobs, workers=4)
-    client, pipeline = create_llamacloud_pipeline(
-        "new_index", embedding_config, transform_config
-    )
-    _ = client.pipelines.create_batch_pipeline_documents(
-        pipeline.id, request=document_upload_objs
-    )
+def collect_garbage(manifest, manifest_name, client=None, api_key=None, ttl=partitions.PARTITION_TTL):
+    """Expire partitions unused for `ttl` seconds and delete the papers no live partition uses
+    from the pipeline. Returns the number of documents deleted."""
+    manifest.expire_partitions(manifest_name, ttl)
+    live = partitions.live_papers(manifest.partitions(manifest_name))
+    entry = manifest.pipeline(manifest_name)
+    stale = [paper_id for paper_id in entry["documents"] if paper_id not in live]
+    if not stale:
+        return 0
+    client = client or get_llama_cloud_client(api_key)
+    limiter = get_limiter("llamacloud", api_key)
+    for paper_id in stale:
+        try:
+            limiter.call(
+                client.pipelines.delete_pipeline_document,
+                document_id=entry["documents"][paper_id]["document_id"],
+                pipeline_id=entry["pipeline_id"],
+            )
+        except Exception as e:
+            if status_code(e) != 404:  # already gone
+                raise
+        manifest.forget(manifest_name, paper_id)
+    print(f"Deleted {len(stale)} documents no report uses from {manifest_name}")
+    return len(stale)
 
 
-def index_as_query_engine():
+async def upload_documents(
+    documents, pipeline_name=PIPELINE_NAME, client=None, manifest=None, llm=None, api_key=None, openai_api_key=None
+):
+    """Upload only papers that are new or changed since the last run, upserting by a stable
+    per-paper document id. `api_key` is the Llama Cloud key and `openai_api_key` the key for
+    metadata extraction and embeddings (None: the keys in the environment). The papers are
+    recorded as a partition and papers of expired partitions are deleted (see collect_garbage).
+    Returns the number of documents uploaded."""
+    llm = llm or get_llm(api_key=openai_api_key)
+    manifest = manifest or get_manifest()
+    client = client or get_llama_cloud_client(api_key)
+    keys = [document_key(document) for document in documents]
+    # the Llama Cloud client and limiter block (and the manifest lock can be held across garbage
+    # collection's deletes), so everything but metadata extraction runs in worker threads
 
-    # Connects to a pre-built index in the Llama Cloud platform.
-    index = LlamaCloudIndex(
-        name="new_index",
-        project_name="Default",
-        api_key=os.environ["LLAMA_CLOUD_API_KEY"],
-    )
+    def claim():
+        manifest_name = record_name(pipeline_name, api_key, client)
+        pending = []
+        with manifest.lock:
+            # claim the papers first, so a concurrent upload's garbage collection keeps them
+            partitions.touch(manifest.partitions(manifest_name), [paper_id for paper_id, _ in keys])
+            for document, (paper_id, content_hash) in zip(documents, keys):
+                if manifest.is_current(manifest_name, paper_id, content_hash, DOCUMENT_SCHEMA):
+                    print(f"Skipping {paper_id}: already ingested")
+                    continue
+                pending.append((document, paper_id, content_hash))
+        return manifest_name, pending
+
+    def upsert(document_upload_objs):
+        with manifest.lock:
+            pipeline_id = get_pipeline_id(
+                client, manifest, pipeline_name, get_embedding_config(openai_api_key), transform_config, api_key=api_key
+            )
+        return get_limiter("llamacloud", api_key).call(
+            client.pipelines.upsert_batch_pipeline_documents, pipeline_id, request=document_upload_objs
+        )
+
+    def finish(cloud_documents):
+        with manifest.lock:
+            for (_, paper_id, content_hash), cloud_document in zip(pending, cloud_documents):
+                manifest.record(manifest_name, paper_id, content_hash, cloud_document.id, DOCUMENT_SCHEMA)
+            collect_garbage(manifest, manifest_name, client, api_key)
+            manifest.save()
+
+    manifest_name, pending = await asyncio.to_thread(claim)
+    cloud_documents = []
+    if pending:
+        extract_jobs = []
+        for document, paper_id, _ in pending:
+            extract_jobs.append(get_document_upload(document, llm, document_id=paper_id))
+        # metadata extraction is paced by the key's OpenAI limiter rather than a fixed worker count
+        document_upload_objs = await asyncio.gather(*extract_jobs)
+        cloud_documents = await asyncio.to_thread(upsert, document_upload_objs)
+
+    await asyncio.to_thread(finish, cloud_documents)
+    return len(pending)
+
+
+def get_cloud_index(api_key=None, name=PIPELINE_NAME):
+    """LlamaCloud index in `api_key`'s project, built once per key"""
+
+    def build():
+        from llama_index.indices.managed.llama_cloud import LlamaCloudIndex
+
+        # Connects to a pre-built index in the Llama Cloud platform.
+        return LlamaCloudIndex(
+            name=name,
+            project_name=PROJECT_NAME,
+            api_key=resolve_key(api_key, "LLAMA_CLOUD_API_KEY"),
+        )
+
+    return get_client(("llama_cloud_index", name), api_key, build)
+
+
+def index_as_query_engine(api_key=None, paper_ids=None, openai_api_key=None):
+    """Query engine over the project's LlamaCloud index. With `paper_ids` retrieval only
+    considers those papers' chunks. Answers are synthesized with `openai_api_key`'s LLM."""
+    filters = None
+    if paper_ids is not None:
+        from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
+
+        filters = MetadataFilters(
+            filters=[MetadataFilter(key="paper_id", value=sorted(set(paper_ids)), operator=FilterOperator.IN)]
+        )
 
-    query_engine = index.as_query_engine(  # Configures a query engine to search the index.
+    query_engine = get_cloud_index(api_key).as_query_engine(  # Configures a query engine to search the index.
         dense_similarity_top_k=10,  # Top k results based on dense (vector) similarity.
         sparse_similarity_top_k=10,  # Top k results based on sparse (keyword-based) similarity.
         alpha=0.5,  # Balances dense and sparse results (0 = only sparse, 1 = only dense).
         enable_reranking=True,  # Reranks results to improve relevance.
         rerank_top_n=5,  # Number of top results to rerank
         retrieval_mode="chunks",  # retrieves text in smaller units (e.g., paragraphs).
+        filters=filters,  # restricts retrieval to the report's papers
+        llm=get_openai_llm(api_key=openai_api_key),  # instead of Settings.llm, which uses the environment key
     )
-    return query_engine
+    return RateLimitedQueryEngine(query_engine, get_limiter("llamacloud", api_key))
@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.instrumentation import tracer
+
+
+def completion_response(text):
+    from llama_index.core.base.llms.types import CompletionResponse
+
+    return CompletionResponse(text=text)
+
+
+class LLMCache:
+    """Content-addressed SQLite store for LLM responses with TTL and LRU eviction by size.
+
+    One connection is shared by all threads behind a lock, and the total size is tracked as entries
+    are written, so lookups and writes are a single indexed statement each."""
+
+    def __init__(self, path="data/llm_cache.sqlite", ttl=7 * 24 * 3600, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl  # seconds an entry stays valid, None to keep forever
+        self.max_bytes = max_bytes  # total size of cached values before LRU eviction
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._conn as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT, size INTEGER, created REAL, accessed REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._total = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def make_key(model, method, prompt, params):
+        payload = json.dumps(
+            {"model": model, "method": method, "prompt": prompt, "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn as conn:
+            row = conn.execute("SELECT value, created, size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total -= row[2]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock, self._conn as conn:
+            previous = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total += size - (previous[0] if previous else 0)
+            if self._total > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        # other processes may share the file, so recount before evicting
+        total = self._stored_bytes()
+        self._total = total
+        if total <= self.max_bytes:
+            return
+        # drop least recently used entries until we are back under budget
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._total = total
+
+    def clear(self):
+        with self._lock, self._conn as conn:
+            conn.execute("DELETE FROM responses")
+            self._total = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CachedLLM:
+    """Wraps a llama_index LLM so completions and structured predictions are served from an LLMCache.
+
+    Every other attribute is delegated to the wrapped LLM. Set `bypass` to always go to the network
+    (fresh responses still get written to the cache)."""
+
+    def __init__(self, llm, cache, bypass=False):
+        self.llm = llm
+        self.cache = cache
+        self.bypass = bypass
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _params(self, kwargs):
+        params = {"temperature": getattr(self.llm, "temperature", None), "max_tokens": getattr(self.llm, "max_tokens", None)}
+        params.update(kwargs)
+        return params
+
+    @property
+    def model_name(self):
+        return getattr(self.llm, "model", type(self.llm).__name__)
+
+    def _key(self, method, prompt, kwargs):
+        return self.cache.make_key(self.model_name, method, prompt, self._params(kwargs))
+
+    def _lookup(self, key):
+        return None if self.bypass else self.cache.get(key)
+
+    async def _alookup(self, key):
+        # cache I/O runs off the event loop so a busy database does not stall concurrent calls
+        return None if self.bypass else await asyncio.to_thread(self.cache.get, key)
+
+    def complete(self, prompt, **kwargs):
+        with tracer.span("llm.complete") as span:
+            key = self._key("complete", prompt, kwargs)
+            cached = self._lookup(key)
+            if cached is not None:
+                tracer.record_llm_call(span, self.model_name, prompt, cached, cached=True)
+                return completion_response(cached)
+            response = self.llm.complete(prompt, **kwargs)
+            self.cache.set(key, response.text)
+            tracer.record_llm_call(span, self.model_name, prompt, response.text, cached=False)
+            return response
+
+    async def acomplete(self, prompt, **kwargs):
+        with tracer.span("llm.complete") as span:
+            key = self._key("complete", prompt, kwargs)
+            cached = await self._alookup(key)
+            if cached is not None:
+                tracer.record_llm_call(span, self.model_name, prompt, cached, cached=True)
+                return completion_response(cached)
+            response = await self.llm.acomplete(prompt, **kwargs)
+            await asyncio.to_thread(self.cache.set, key, response.text)
+            tracer.record_llm_call(span, self.model_name, prompt, response.text, cached=False)
+            return response
+
+    def _structured_key(self, output_cls, prompt, prompt_args):
+        template = getattr(prompt, "template", str(prompt))
+        return self._key(f"structured_predict:{output_cls.__name__}", template, prompt_args)
+
+    @staticmethod
+    def _prompt_text(prompt, prompt_args):
+        return prompt.format(**prompt_args) if hasattr(prompt, "format") else str(prompt)
+
+    def structured_predict(self, output_cls, prompt, **prompt_args):
+        with tracer.span("llm.structured_predict") as span:
+            prompt_text = self._prompt_text(prompt, prompt_args)
+            key = self._structured_key(output_cls, prompt, prompt_args)
+            cached = self._lookup(key)
+            if cached is not None:
+                tracer.record_llm_call(span, self.model_name, prompt_text, cached, cached=True)
+                return output_cls.model_validate_json(cached)
+            result = self.llm.structured_predict(output_cls, prompt, **prompt_args)
+            self.cache.set(key, result.model_dump_json())
+            tracer.record_llm_call(span, self.model_name, prompt_text, result.model_dump_json(), cached=False)
+            return result
+
+    async def astructured_predict(self, output_cls, prompt, **prompt_args):
+        with tracer.span("llm.structured_predict") as span:
+            prompt_text = self._prompt_text(prompt, prompt_args)
+            key = self._structured_key(output_cls, prompt, prompt_args)
+            cached = await self._alookup(key)
+            if cached is not None:
+                tracer.record_llm_call(span, self.model_name, prompt_text, cached, cached=True)
+                return output_cls.model_validate_json(cached)
+            result = await self.llm.astructured_predict(output_cls, prompt, **prompt_args)
+            await asyncio.to_thread(self.cache.set, key, result.model_dump_json())
+            tracer.record_llm_call(span, self.model_name, prompt_text, result.model_dump_json(), cached=False)
+            return result
+
+
+_cache = None
+
+
+def get_llm_cache():
+    global _cache
+    if _cache is None:
+        _cache = LLMCache(os.environ.get("LLM_CACHE_PATH", "data/llm_cache.sqlite"))
+    return _cache
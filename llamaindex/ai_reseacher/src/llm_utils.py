@@ -1,4 +1,35 @@
-from llama_index.llms.openai import OpenAI
-def get_llm():
-    llm = OpenAI(model="gpt-4o-mini")
-    return llm
\ No newline at end of file
+import os
+from src import registry
+from src.client_pool import key_id
+from src.llm_cache import CachedLLM, get_llm_cache
+from src.rate_limiter import RateLimitedLLM, get_limiter
+
+
+def build_llm(model, cache, api_key=None):
+    from llama_index.llms.openai import OpenAI
+
+    # retries are left to the key's limiter so it sees every 429
+    llm = RateLimitedLLM(OpenAI(model=model, api_key=api_key, max_retries=0), get_limiter("openai", api_key))
+    if not cache:
+        return llm
+    # the response cache is content addressed, so it is shared across keys
+    # LLM_CACHE_BYPASS=1 forces fresh responses while still refreshing the cache
+    bypass = os.environ.get("LLM_CACHE_BYPASS", "") == "1"
+    return CachedLLM(llm, get_llm_cache(), bypass=bypass)
+
+
+def get_llm(cache=True, model="gpt-4o-mini", api_key=None):
+    """Shared LLM for `api_key` (None: OPENAI_API_KEY from the environment)"""
+    return registry.get_or_create(("llm", model, cache, key_id(api_key)), lambda: build_llm(model, cache, api_key))
+
+
+def get_openai_llm(model="gpt-4o-mini", api_key=None):
+    """Plain llama_index OpenAI LLM for `api_key`, for llama_index components that need an LLM
+    instance (such as the cloud query engine's response synthesis)"""
+
+    def build():
+        from llama_index.llms.openai import OpenAI
+
+        return OpenAI(model=model, api_key=api_key)
+
+    return registry.get_or_create(("openai_llm", model, key_id(api_key)), build)
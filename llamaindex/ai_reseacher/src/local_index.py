@@ -0,0 +1,335 @@
+"""In-process hybrid (dense + BM25) index that can stand in for LlamaCloudIndex.
+
+Embeddings live in a float32 file that is memory-mapped for search, keyword retrieval uses an
+inverted index scored with BM25, and the two are fused with the same `alpha` weighting the
+LlamaCloud query engine uses. Everything persists under one directory and new papers can be
+added incrementally through the streaming EmbeddingPipeline; identical chunks are stored once.
+
+Reports retrieve from their own partition (paper set, see src.partitions): dense and BM25 scores
+are computed over the partition's rows only, with partition-local BM25 statistics, so a query
+costs the same as on an index holding just those papers. Papers of expired partitions are
+garbage-collected and the store is compacted once enough of it is dead.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from src import partitions, registry
+from src.embedding_pipeline import EmbeddingPipeline, VectorStore, stream_chunks
+from src.ingest_manifest import config_hash, document_key
+
+LOCAL_INDEX_DIR = "data/local_index"
+COMPACT_FRACTION = 0.5  # compact once this share of stored rows is dead
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder: signed feature hashing of unigrams and bigrams"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vectors[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class LocalResponse:
+    def __init__(self, response, source_nodes):
+        self.response = response
+        self.source_nodes = source_nodes
+
+    def __str__(self):
+        return self.response
+
+
+class LocalHybridIndex:
+    def __init__(self, path=LOCAL_INDEX_DIR, embedder=None, chunk_size=1024, chunk_overlap=20, k1=1.5, b=0.75, batch_size=64):
+        # chunk_size and chunk_overlap mirror the cloud transform_config, counting whitespace-separated words
+        self.path = path
+        self.embedder = embedder or HashingEmbedder()
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.k1 = k1
+        self.b = b
+        os.makedirs(path, exist_ok=True)
+        self.meta = {"dim": self.embedder.dim, "papers": {}, "deleted": [], "generation": 0, "partitions": {}}
+        self.store = VectorStore(path, self.embedder.dim)  # one row per distinct chunk
+        self.pipeline = EmbeddingPipeline(self.embedder, self.store, batch_size=batch_size)
+        self.postings = {}  # term -> {chunk row: term frequency}
+        self.lengths = []
+        self.lock = threading.RLock()  # the index is shared by concurrent reports
+        self.load()
+
+    def load(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        self.meta.setdefault("generation", 0)
+        self.meta.setdefault("partitions", {})
+        if self.meta["dim"] != self.embedder.dim:
+            raise ValueError(f"Index at {self.path} has dim {self.meta['dim']}, embedder has {self.embedder.dim}")
+        for row, record in self.store.scan():
+            self.index_terms(row, record["text"])
+
+    def version(self):
+        return len(self.store), len(self.meta["deleted"]), self.meta["generation"]
+
+    def partition_version(self, paper_ids):
+        """Changes only when one of `paper_ids` is added or changed"""
+        papers = self.meta["papers"]
+        return config_hash({paper_id: papers.get(paper_id, {}).get("content_hash") for paper_id in sorted(set(paper_ids))})
+
+    def partition_rows(self, paper_ids):
+        # rows of live papers are never in meta["deleted"]
+        papers = self.meta["papers"]
+        rows = {row for paper_id in set(paper_ids) for row in papers.get(paper_id, {}).get("rows", [])}
+        return np.asarray(sorted(rows), dtype=np.int64)
+
+    def save(self):
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(self.meta, f)
+
+    def index_terms(self, row, text):
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[row] = tf
+        self.lengths.append(sum(counts.values()))
+
+    def matrix(self):
+        return self.store.matrix()
+
+    def add_documents(self, documents):
+        """Index parsed papers (lists of page Documents), skipping ones already indexed unchanged.
+        Papers are streamed page by page through the embedding pipeline. Returns the number of
+        papers added."""
+        with self.lock:
+            return self._add_documents(documents)
+
+    def _add_documents(self, documents):
+        added = 0
+        for document in documents:
+            paper_id, content_hash = document_key(document)
+            previous = self.meta["papers"].get(paper_id)
+            if previous and previous["content_hash"] == content_hash:
+                continue
+
+            rows = []
+            chunks = stream_chunks(document, self.chunk_size, self.chunk_overlap)
+            for row, text, is_new in self.pipeline.ingest(chunks, {"paper_id": paper_id}):
+                if is_new:
+                    self.index_terms(row, text)
+                rows.append(row)
+            self.meta["papers"][paper_id] = {"content_hash": content_hash, "rows": sorted(set(rows))}
+
+            deleted = set(self.meta["deleted"]) - set(rows)
+            if previous:
+                # the paper changed: hide old chunks no other paper still uses
+                live = {row for other, paper in self.meta["papers"].items() if other != paper_id for row in paper["rows"]}
+                deleted |= set(previous["rows"]) - set(rows) - live
+            self.meta["deleted"] = sorted(deleted)
+            added += 1
+        if added:
+            self.meta["generation"] += 1
+        self.save()
+        return added
+
+    def touch_partition(self, paper_ids):
+        with self.lock:
+            partition = partitions.touch(self.meta["partitions"], paper_ids)
+            self.save()
+            return partition
+
+    def collect_garbage(self, ttl=partitions.PARTITION_TTL, compact_fraction=COMPACT_FRACTION):
+        """Expire partitions unused for `ttl` seconds and drop the papers no live partition uses.
+        Their chunks are hidden right away and the store is compacted once more than
+        `compact_fraction` of it is dead. Returns the number of papers dropped."""
+        with self.lock:
+            partitions.expire(self.meta["partitions"], ttl)
+            live = partitions.live_papers(self.meta["partitions"])
+            dead = [paper_id for paper_id in self.meta["papers"] if paper_id not in live]
+            for paper_id in dead:
+                del self.meta["papers"][paper_id]
+            if dead:
+                kept = {row for paper in self.meta["papers"].values() for row in paper["rows"]}
+                self.meta["deleted"] = sorted(set(range(len(self.store))) - kept)
+                self.meta["generation"] += 1
+            if len(self.meta["deleted"]) > compact_fraction * len(self.store):
+                self.compact()
+            self.save()
+            return len(dead)
+
+    def compact(self):
+        """Rewrite the store without deleted rows and renumber the papers' rows"""
+        with self.lock:
+            deleted = set(self.meta["deleted"])
+            remap = self.store.compact([row for row in range(len(self.store)) if row not in deleted])
+            for paper in self.meta["papers"].values():
+                paper["rows"] = [remap[row] for row in paper["rows"]]
+            self.meta["deleted"] = []
+            self.meta["generation"] += 1
+            self.postings = {}
+            self.lengths = []
+            for row, record in self.store.scan():
+                self.index_terms(row, record["text"])
+            self.save()
+
+    def bm25_scores(self, query, rows=None):
+        """BM25 scores for every stored row, or with `rows` for those rows only, using statistics
+        of just those rows"""
+        if rows is not None:
+            return self.partition_bm25_scores(query, rows)
+        scores = np.zeros(len(self.store), dtype=np.float32)
+        if not len(self.store):
+            return scores
+        lengths = np.asarray(self.lengths, dtype=np.float32)
+        avg_length = float(lengths.mean()) or 1.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.store) - len(postings) + 0.5) / (len(postings) + 0.5))
+            rows = np.fromiter(postings.keys(), dtype=np.int64)
+            tf = np.fromiter(postings.values(), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths[rows] / avg_length)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def partition_bm25_scores(self, query, rows):
+        scores = np.zeros(len(rows), dtype=np.float32)
+        row_list = rows.tolist()
+        lengths = np.fromiter((self.lengths[row] for row in row_list), dtype=np.float32, count=len(row_list))
+        avg_length = float(lengths.mean()) if len(row_list) else 1.0
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            tf = np.fromiter((postings.get(row, 0) for row in row_list), dtype=np.float32, count=len(row_list))
+            df = int(np.count_nonzero(tf))
+            if not df:
+                continue
+            idf = math.log(1 + (len(row_list) - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths / (avg_length or 1.0))
+            scores += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    @staticmethod
+    def top_k(scores, k):
+        k = min(k, len(scores))
+        if k == 0:
+            return np.array([], dtype=np.int64)
+        rows = np.argpartition(-scores, k - 1)[:k]
+        return rows[np.argsort(-scores[rows])]
+
+    @staticmethod
+    def min_max(values):
+        spread = values.max() - values.min() if len(values) else 0
+        return (values - values.min()) / spread if spread > 0 else np.ones_like(values)
+
+    def retrieve(self, query, dense_similarity_top_k=10, sparse_similarity_top_k=10, alpha=0.5, rerank_top_n=5, reranker=None, paper_ids=None):
+        """Hybrid retrieval: alpha * dense + (1 - alpha) * sparse over the union of both top-k lists.
+        `reranker(query, candidates)` may reorder the fused candidates before the top n are kept.
+        With `paper_ids` only those papers' chunks are searched."""
+        query_vector = self.embedder.embed([query])[0]
+        with self.lock:
+            if paper_ids is None:
+                if not len(self.store):
+                    return []
+                rows = None
+                dense = self.matrix() @ query_vector
+                sparse = self.bm25_scores(query)
+                if self.meta["deleted"]:
+                    deleted = np.asarray(self.meta["deleted"], dtype=np.int64)
+                    dense[deleted] = -np.inf
+                    sparse[deleted] = -np.inf
+            else:
+                rows = self.partition_rows(paper_ids)
+                if not len(rows):
+                    return []
+                dense = np.asarray(self.matrix()[rows]) @ query_vector
+                sparse = self.bm25_scores(query, rows)
+
+            # candidates are positions in dense/sparse, which are rows unless searching a partition
+            candidates = np.union1d(self.top_k(dense, dense_similarity_top_k), self.top_k(sparse, sparse_similarity_top_k))
+            candidates = candidates[np.isfinite(dense[candidates])]
+            fused = alpha * self.min_max(dense[candidates]) + (1 - alpha) * self.min_max(sparse[candidates])
+            order = candidates[np.argsort(-fused)]
+            scores = dict(zip(candidates.tolist(), fused.tolist()))
+            results = [
+                {**self.store.record(position if rows is None else int(rows[position])), "score": scores[position]}
+                for position in order.tolist()
+            ]
+        if reranker is not None:
+            results = reranker(query, results)
+        return results[:rerank_top_n]
+
+    def as_query_engine(self, llm=None, **retrieve_kwargs):
+        return LocalQueryEngine(self, llm, retrieve_kwargs)
+
+
+class LocalQueryEngine:
+    """query/aquery interface matching what ReportGenerationAgent expects from the cloud query engine.
+    Without an LLM the retrieved chunks are returned as the answer."""
+
+    def __init__(self, index, llm, retrieve_kwargs):
+        self.index = index
+        self.llm = llm
+        self.retrieve_kwargs = retrieve_kwargs
+
+    def prompt(self, query, nodes):
+        context = "\n\n---\n\n".join(node["text"] for node in nodes)
+        return f"Context information is below.\n\n{context}\n\nGiven the context information and not prior knowledge, answer the query.\nQuery: {query}\nAnswer: "
+
+    def query(self, query):
+        nodes = self.index.retrieve(query, **self.retrieve_kwargs)
+        if self.llm is None:
+            return LocalResponse("\n\n".join(node["text"] for node in nodes), nodes)
+        return LocalResponse(str(self.llm.complete(self.prompt(query, nodes))), nodes)
+
+    async def aquery(self, query):
+        nodes = await asyncio.to_thread(self.index.retrieve, query, **self.retrieve_kwargs)
+        if self.llm is None:
+            return LocalResponse("\n\n".join(node["text"] for node in nodes), nodes)
+        return LocalResponse(str(await self.llm.acomplete(self.prompt(query, nodes))), nodes)
+
+
+def get_local_index(path=LOCAL_INDEX_DIR):
+    """One index instance per directory, shared by every report in the process"""
+    return registry.get_or_create(("local_index", os.path.abspath(path)), lambda: LocalHybridIndex(path))
+
+
+def local_index_as_query_engine(documents, llm=None, path=LOCAL_INDEX_DIR):
+    """Add `documents` to the shared index and return it with a query engine restricted to them"""
+    index = get_local_index(path)
+    paper_ids = [document_key(document)[0] for document in documents]
+    index.touch_partition(paper_ids)  # before adding, so a concurrent collection keeps these papers
+    index.add_documents(documents)
+    index.collect_garbage()
+    return index, index.as_query_engine(
+        llm=llm,
+        dense_similarity_top_k=10,
+        sparse_similarity_top_k=10,
+        alpha=0.5,
+        rerank_top_n=5,
+        paper_ids=paper_ids,
+    )
@@ -0,0 +1,111 @@
+"""PDF parser backends.
+
+A parser is anything with `load_data(pdf_path)` returning a list of page Documents, which is the
+interface LlamaParse already has. `get_parser` picks a backend per run:
+
+- "llamaparse": the remote LlamaParse service (markdown output, best quality, needs an API key)
+- "local": text extraction with pypdf, turned into markdown-ish pages, run in a process pool so
+  pages of one paper and several papers are extracted in parallel. Works offline.
+"""
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from src import registry
+
+PARSER_BACKENDS = ("llamaparse", "local")
+PAGES_PER_TASK = 4
+
+_HYPHENATED = re.compile(r"(\w)-\n(\w)")
+_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+[A-Z][^.]{0,80}$")
+
+
+def to_markdown(text):
+    """Rejoin wrapped lines into paragraphs and mark numbered section headings"""
+    text = _HYPHENATED.sub(r"\1\2", text.replace("\r", ""))
+    blocks = []
+    paragraph = []
+    for line in (line.strip() for line in text.split("\n")):
+        if not line or _HEADING.match(line):
+            if paragraph:
+                blocks.append(" ".join(paragraph))
+                paragraph = []
+            if line:
+                blocks.append(f"## {line}")
+        else:
+            paragraph.append(line)
+    if paragraph:
+        blocks.append(" ".join(paragraph))
+    return "\n\n".join(blocks)
+
+
+def extract_pages(pdf_path, start, stop):
+    # runs in a worker process
+    from pypdf import PdfReader
+
+    logging.getLogger("pypdf").setLevel(logging.ERROR)  # font warnings are noise for plain text
+    reader = PdfReader(pdf_path)
+    return [to_markdown(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def page_count(pdf_path):
+    from pypdf import PdfReader
+
+    return len(PdfReader(pdf_path).pages)
+
+
+class LocalPDFParser:
+    """pypdf-based stand-in for LlamaParse: one Document per page, extracted in a process pool"""
+
+    result_type = "markdown"
+    version = 1  # bump when the extraction output changes so cached parses are redone
+    remote = False
+
+    def __init__(self, num_workers=4, pages_per_task=PAGES_PER_TASK):
+        try:
+            import pypdf  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The local parser needs pypdf: pip install pypdf") from e
+        self.num_workers = num_workers
+        self.pages_per_task = pages_per_task
+
+    def pool(self):
+        # shared by every paper parsed in this process so papers and pages interleave. Workers are
+        # spawned, not forked: the pool is created from job and Streamlit threads, and forking a
+        # threaded process can copy locks held by other threads.
+        return registry.get_or_create(
+            ("pdf_process_pool", self.num_workers),
+            lambda: ProcessPoolExecutor(max_workers=self.num_workers, mp_context=multiprocessing.get_context("spawn")),
+        )
+
+    def load_data(self, pdf_path):
+        from llama_index.core import Document
+
+        pages = page_count(pdf_path)
+        futures = [
+            self.pool().submit(extract_pages, pdf_path, start, min(start + self.pages_per_task, pages))
+            for start in range(0, pages, self.pages_per_task)
+        ]
+        texts = [text for future in futures for text in future.result()]
+        return [
+            Document(text=text, metadata={"file_path": pdf_path, "page_label": str(i + 1)})
+            for i, text in enumerate(texts)
+        ]
+
+
+def get_parser(backend="llamaparse", num_workers=4, api_key=None):
+    """Parser for `backend`. LlamaParse clients are pooled per API key (None: LLAMA_CLOUD_API_KEY)."""
+    if backend == "llamaparse":
+        from src.client_pool import get_client, resolve_key
+
+        def build():
+            from llama_parse import LlamaParse
+
+            api = resolve_key(api_key, "LLAMA_CLOUD_API_KEY")
+            return LlamaParse(api_key=api, result_type="markdown", num_workers=num_workers, verbose=True)
+
+        return get_client(("llamaparse", num_workers), api_key, build)
+    if backend == "local":
+        return LocalPDFParser(num_workers=num_workers)
+    raise ValueError(f"Unknown parser backend {backend!r}, expected one of {PARSER_BACKENDS}")
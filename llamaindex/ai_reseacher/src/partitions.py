@@ -0,0 +1,41 @@
+"""Index partitions: the paper set of a report.
+
+Both index backends keep one store of papers per account, so a paper used by several reports is
+embedded and uploaded once, but each report only retrieves from its own papers. A partition
+records a paper set and when a report last used it. Partitions unused for PARTITION_TTL seconds
+expire, and papers that no live partition references are garbage-collected from the index.
+
+Partitions are kept as a plain dict (partition id -> {"papers", "last_used"}) inside the ingest
+manifest or the local index metadata, next to the papers they refer to.
+"""
+import os
+import time
+
+from src.ingest_manifest import config_hash
+
+# INDEX_PARTITION_TTL_DAYS overrides the default of a week
+PARTITION_TTL = float(os.environ.get("INDEX_PARTITION_TTL_DAYS", 7)) * 24 * 3600
+
+
+def partition_id(paper_ids):
+    return config_hash(sorted(set(paper_ids)))[:16]
+
+
+def touch(partitions, paper_ids, now=None):
+    """Record that a report used `paper_ids` and return the partition id"""
+    partition = partition_id(paper_ids)
+    partitions[partition] = {"papers": sorted(set(paper_ids)), "last_used": now or time.time()}
+    return partition
+
+
+def expire(partitions, ttl=PARTITION_TTL, now=None):
+    """Drop partitions unused for `ttl` seconds and return their ids"""
+    now = now or time.time()
+    expired = [partition for partition, entry in partitions.items() if now - entry["last_used"] > ttl]
+    for partition in expired:
+        del partitions[partition]
+    return expired
+
+
+def live_papers(partitions):
+    return {paper_id for entry in partitions.values() for paper_id in entry["papers"]}
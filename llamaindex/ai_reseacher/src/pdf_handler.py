@@ -1,43 +1,135 @@
 import os
-import pickle
-from llama_parse import LlamaParse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
-def parse_and_cache_pdfs(selected_papers):
-    os.makedirs("data/papers", exist_ok=True)
-    os.makedirs("data/parsed_docs", exist_ok=True)
-    llama_parse = LlamaParse(result_type="markdown", num_workers=4, verbose=True)
-
-    parsed_docs = []
-    for paper in selected_papers:
-        paper_id_safe = paper['id'].split("/")[-1]
-        pdf_path = f"data/papers/{paper_id_safe}.pdf"
-        parsed_doc_path = f"data/parsed_docs/{paper_id_safe}.pkl"
-        if not os.path.exists(pdf_path):
+from requests.adapters import HTTPAdapter
+from src import doc_store
+from src.doc_store import PAPERS_DIR, PARSED_DOCS_DIR
+from src.parsers import get_parser
+from src.rate_limiter import get_limiter
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def make_session(pool_size):
+    # one pooled session so concurrent downloads reuse connections to arxiv.org
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_pdf(session, url, pdf_path, timeout=60):
+    """Stream a PDF to disk in chunks; the final path only appears once the download is complete"""
+    tmp_path = f"{pdf_path}.{os.getpid()}-{threading.get_ident()}.part"
+    try:
+        with session.get(url, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        os.replace(tmp_path, pdf_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def fetch_pdf(session, paper, pdf_path):
+    start = time.perf_counter()
+    if os.path.exists(pdf_path):
+        print(f"Using cached PDF for {paper['title']}")
+    else:
+        download_pdf(session, paper['url'], pdf_path)
+    return time.perf_counter() - start
+
+
+def parser_settings(parser):
+    settings = {"parser": type(parser).__name__, "result_type": getattr(parser, "result_type", None)}
+    if hasattr(parser, "version"):
+        settings["version"] = parser.version
+    return settings
+
+
+def load_or_parse(parser, paper, pdf_path, paper_id_safe, limiter=None):
+    start = time.perf_counter()
+    settings = parser_settings(parser)
+    legacy_path = f"{PARSED_DOCS_DIR}/{paper_id_safe}.pkl"
+    document = doc_store.load(paper_id_safe, pdf_path, settings)
+    if document is not None:
+        print(f"Using cached Markdown for {paper['title']}")
+    elif os.path.exists(legacy_path) and settings == doc_store.LLAMA_PARSE_SETTINGS:
+        document = doc_store.migrate_pickle(legacy_path)
+        print(f"Migrated cached Markdown for {paper['title']} from {legacy_path}")
+    else:
+        if limiter is not None:
+            pages = limiter.call(parser.load_data, pdf_path)
+        else:
+            pages = parser.load_data(pdf_path)
+        document = doc_store.save(paper_id_safe, pages, pdf_path, settings)
+        print(f"Parsed and cached document for {paper['title']} at {doc_store.store_path(paper_id_safe)}")
+    return document, time.perf_counter() - start
+
+
+def parse_and_cache_pdfs(
+    selected_papers, max_downloads=4, max_parses=4, parser=None, timings=None, backend="llamaparse", api_key=None
+):
+    """Download and parse the selected papers as a pipeline: each paper is handed to the parse
+    pool as soon as its download lands. A paper selected more than once is fetched and parsed
+    once. Returns the parsed documents in the order of `selected_papers`, skipping papers that
+    failed. `backend` picks the parser (see src.parsers)
+    unless a `parser` is given; `api_key` is the Llama Cloud key for remote parsing. If
+    `timings` is a dict it is filled with per-stage seconds."""
+    os.makedirs(PAPERS_DIR, exist_ok=True)
+    os.makedirs(PARSED_DOCS_DIR, exist_ok=True)
+    parser = parser or get_parser(backend, num_workers=max_parses, api_key=api_key)
+    # remote parses are paced per account
+    limiter = get_limiter("llamaparse", api_key) if getattr(parser, "remote", True) else None
+    timings = timings if timings is not None else {}
+    timings.update({"download": 0.0, "parse": 0.0})
+
+    start = time.perf_counter()
+    results = {}
+    with make_session(max_downloads) as session, \
+            ThreadPoolExecutor(max_workers=max_downloads) as download_pool, \
+            ThreadPoolExecutor(max_workers=max_parses) as parse_pool:
+        # paper id -> indexes in selected_papers, so duplicates share one download and parse
+        positions = {}
+        for idx, paper in enumerate(selected_papers):
+            positions.setdefault(paper['id'].split("/")[-1], []).append(idx)
+
+        downloads = {}
+        for paper_id_safe, indexes in positions.items():
+            paper = selected_papers[indexes[0]]
+            pdf_path = f"{PAPERS_DIR}/{paper_id_safe}.pdf"
+            future = download_pool.submit(fetch_pdf, session, paper, pdf_path)
+            downloads[future] = (indexes, paper, pdf_path, paper_id_safe)
+
+        parses = {}
+        for future in as_completed(downloads):
+            indexes, paper, pdf_path, paper_id_safe = downloads[future]
             try:
-                response = requests.get(paper['url'])
-                response.raise_for_status()
-                with open(pdf_path,'wb') as f:
-                    f.write(response.content)
+                timings["download"] += future.result()
             except requests.exceptions.RequestException as e:
                 print(f"Failed to download PDF for {paper['title']}: {e}")
                 continue
-        else:
-            print(f"Using cached PDF for {paper['title']}")
-            
-        
-        if os.path.exists(parsed_doc_path):
-            print(f"Using cached Markdown for {paper['title']}")
-            with open(parsed_doc_path, 'rb') as f:
-                document = pickle.load(f)
-        else:
+            parses[parse_pool.submit(load_or_parse, parser, paper, pdf_path, paper_id_safe, limiter)] = (indexes, paper)
+
+        for future in as_completed(parses):
+            indexes, paper = parses[future]
             try:
-                document = llama_parse.load_data(pdf_path)
-                with open(parsed_doc_path, 'wb') as f:
-                    pickle.dump(document, f)
-                print(f"Parsed and cached document for {paper['title']} at {parsed_doc_path}")
+                document, elapsed = future.result()
             except Exception as e:
                 print(f"Failed to parse {paper['title']}: {e}")
                 continue
-        parsed_docs.append(document)
-                
-    return parsed_docs
+            timings["parse"] += elapsed
+            for idx in indexes:
+                results[idx] = document
+
+    timings["total"] = time.perf_counter() - start
+    print(
+        f"Fetched {len(results)}/{len(selected_papers)} papers in {timings['total']:.2f}s "
+        f"(download {timings['download']:.2f}s, parse {timings['parse']:.2f}s summed across workers)"
+    )
+    return [results[idx] for idx in sorted(results)]
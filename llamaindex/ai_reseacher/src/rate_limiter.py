@@ -0,0 +1,329 @@
+"""Adaptive concurrency limiting for OpenAI, LlamaParse and LlamaCloud calls.
+
+Every provider gets one process-wide AdaptiveLimiter. The number of calls allowed in flight grows
+by one per window of successful calls and is halved when the provider answers 429 (AIMD), so
+throughput climbs to the provider's limit and backs off as soon as it is hit. Rate-limited and
+transient failures are retried with exponential backoff and full jitter, honouring Retry-After.
+Optional per-minute request and token budgets pace calls before they are sent.
+
+Limiters are thread-safe and can be awaited from any event loop, since report jobs each run their
+own loop in a worker thread while parsing uses thread pools.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from src import registry
+from src.instrumentation import count_tokens
+
+# defaults per provider, overridable with <PROVIDER>_MAX_CONCURRENCY, <PROVIDER>_RPM and <PROVIDER>_TPM
+PROVIDER_LIMITS = {
+    "openai": {"initial_limit": 8, "max_limit": 64, "requests_per_minute": 500, "tokens_per_minute": 200_000},
+    "llamaparse": {"initial_limit": 4, "max_limit": 16, "requests_per_minute": 60},
+    "llamacloud": {"initial_limit": 4, "max_limit": 32, "requests_per_minute": 600},
+}
+THROTTLE_STATUS = {429, 503}
+TRANSIENT_STATUS = {408, 500, 502, 504}
+TRANSIENT_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectError", "ConnectTimeout", "ReadTimeout", "RemoteProtocolError"}
+
+
+def status_code(error):
+    for source in (error, getattr(error, "response", None)):
+        code = getattr(source, "status_code", None) or getattr(source, "status", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_throttled(error):
+    return status_code(error) in THROTTLE_STATUS or type(error).__name__ == "RateLimitError"
+
+
+def is_retryable(error):
+    return (
+        is_throttled(error)
+        or status_code(error) in TRANSIENT_STATUS
+        or isinstance(error, (ConnectionError, TimeoutError))
+        or type(error).__name__ in TRANSIENT_ERRORS
+    )
+
+
+def retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateBudget:
+    """Per-minute allowance (requests or tokens) that refills continuously. Reservations may go
+    into debt; the caller waits the returned number of seconds for the debt to be repaid."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            self.available -= min(amount, self.capacity)
+            return max(0.0, -self.available / self.rate)
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        name,
+        initial_limit=4,
+        min_limit=1,
+        max_limit=32,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_retries=6,
+        base_delay=0.5,
+        max_delay=30.0,
+        backoff=0.5,
+        target_latency=None,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.requests = RateBudget(requests_per_minute) if requests_per_minute else None
+        self.tokens = RateBudget(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backoff = backoff  # multiplicative decrease on throttling
+        self.target_latency = target_latency  # seconds; slower successes stop the limit growing
+        self.in_flight = 0
+        self.waiters = deque()  # (waiter, grant) in arrival order
+        self.last_decrease = 0.0
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _take_slot(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _wake(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            _, grant = self.waiters.popleft()
+            self._take_slot()
+            grant()
+
+    def acquire(self):
+        with self._lock:
+            if not self.waiters and self.in_flight < int(self.limit):
+                self._take_slot()
+                return
+            event = threading.Event()
+            self.waiters.append((event, event.set))
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            # a slot handed to a waiter that was cancelled meanwhile goes straight back
+            if future.cancelled():
+                self.release()
+            else:
+                future.set_result(None)
+
+        with self._lock:
+            if not self.waiters and self.in_flight < int(self.limit):
+                self._take_slot()
+                return
+            waiter = (future, lambda: loop.call_soon_threadsafe(grant))
+            self.waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = waiter in self.waiters
+                if queued:
+                    self.waiters.remove(waiter)
+            if not queued and future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self, latency=None):
+        with self._lock:
+            self.in_flight -= 1
+            if latency is not None and (self.target_latency is None or latency <= self.target_latency):
+                # additive increase: about +1 per `limit` successful calls
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._wake()
+
+    def on_throttle(self, started):
+        with self._lock:
+            self.throttled += 1
+            # calls that were already in flight when we last backed off do not count again
+            if started > self.last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = time.monotonic()
+
+    def pacing_delay(self, tokens):
+        delay = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def retry_delay(self, error, started, attempt):
+        """Seconds to wait before retrying `error`, or None when it should be raised"""
+        if not is_retryable(error) or attempt >= self.max_retries:
+            return None
+        if is_throttled(error):
+            self.on_throttle(started)
+        with self._lock:
+            self.retries += 1
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after(error) or 0.0)
+
+    def call(self, fn, *args, tokens=0, **kwargs):
+        """Run `fn(*args, **kwargs)` under the limiter, retrying throttled and transient failures"""
+        attempt = 0
+        while True:
+            time.sleep(self.pacing_delay(tokens))
+            self.acquire()
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+                self.release()
+                delay = self.retry_delay(error, started, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.release()
+                raise
+            else:
+                self.release(latency=time.monotonic() - started)
+                with self._lock:
+                    self.calls += 1
+                return result
+            print(f"{self.name}: retrying after {type(error).__name__} in {delay:.1f}s (limit {int(self.limit)})")
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn, *args, tokens=0, **kwargs):
+        """Await `fn(*args, **kwargs)` under the limiter, retrying throttled and transient failures"""
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.pacing_delay(tokens))
+            await self.aacquire()
+            started = time.monotonic()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+                self.release()
+                delay = self.retry_delay(error, started, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.release()
+                raise
+            else:
+                self.release(latency=time.monotonic() - started)
+                with self._lock:
+                    self.calls += 1
+                return result
+            print(f"{self.name}: retrying after {type(error).__name__} in {delay:.1f}s (limit {int(self.limit)})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+
+def provider_settings(provider):
+    settings = dict(PROVIDER_LIMITS.get(provider, {}))
+    prefix = provider.upper()
+    for env, key in (("MAX_CONCURRENCY", "max_limit"), ("RPM", "requests_per_minute"), ("TPM", "tokens_per_minute")):
+        value = os.environ.get(f"{prefix}_{env}")
+        if value:
+            settings[key] = int(value)
+    if "initial_limit" in settings and "max_limit" in settings:
+        settings["initial_limit"] = min(settings["initial_limit"], settings["max_limit"])
+    return settings
+
+
+def get_limiter(provider, api_key=None):
+    """Limiter for `provider`. Quotas are per account, so each API key gets its own limiter; None
+    is the key from the environment."""
+    from src.client_pool import key_id
+
+    return registry.get_or_create(
+        ("limiter", provider, key_id(api_key)), lambda: AdaptiveLimiter(provider, **provider_settings(provider))
+    )
+
+
+class RateLimitedLLM:
+    """Routes an LLM's completion and structured prediction calls through a limiter. The prompt's
+    token count is charged against the limiter's token budget. Other attributes are delegated."""
+
+    def __init__(self, llm, limiter):
+        self.llm = llm
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    @staticmethod
+    def _prompt_tokens(prompt, prompt_args=None):
+        text = prompt.format(**prompt_args) if prompt_args is not None and hasattr(prompt, "format") else str(prompt)
+        return count_tokens(text)
+
+    def complete(self, prompt, **kwargs):
+        return self.limiter.call(self.llm.complete, prompt, tokens=self._prompt_tokens(prompt), **kwargs)
+
+    async def acomplete(self, prompt, **kwargs):
+        return await self.limiter.acall(self.llm.acomplete, prompt, tokens=self._prompt_tokens(prompt), **kwargs)
+
+    def structured_predict(self, output_cls, prompt, **prompt_args):
+        tokens = self._prompt_tokens(prompt, prompt_args)
+        return self.limiter.call(self.llm.structured_predict, output_cls, prompt, tokens=tokens, **prompt_args)
+
+    async def astructured_predict(self, output_cls, prompt, **prompt_args):
+        tokens = self._prompt_tokens(prompt, prompt_args)
+        return await self.limiter.acall(self.llm.astructured_predict, output_cls, prompt, tokens=tokens, **prompt_args)
+
+
+class RateLimitedQueryEngine:
+    """query/aquery through a limiter; other attributes are delegated to the wrapped engine"""
+
+    def __init__(self, query_engine, limiter):
+        self.query_engine = query_engine
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.query_engine, name)
+
+    def query(self, query):
+        return self.limiter.call(self.query_engine.query, query)
+
+    async def aquery(self, query):
+        return await self.limiter.acall(self.query_engine.aquery, query)
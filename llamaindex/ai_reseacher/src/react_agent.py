@@ -0,0 +1,229 @@
+"""Async ReAct agent, promoted from reACT.ipynb.
+
+The agent prompts the LLM in the ReAct text format (Thought / Action / Action Input / Answer)
+through `acomplete`, so the LLM response cache and rate limiter apply to every step. Differences
+from the notebook workflow:
+
+- a step may request several actions; independent tool calls run concurrently
+- the reasoning trace is kept to a token budget: long observations are truncated and older steps
+  are folded into a summary instead of re-sending the whole trace every step
+- results of deterministic tools are cached by (tool, arguments)
+
+With a search tool over the paper index the agent exposes `query`/`aquery`, so it can stand in as
+the query engine for INDEX subsections in ReportGenerationAgent.
+"""
+import asyncio
+import inspect
+import json
+import re
+from collections import OrderedDict
+
+from src.context_packing import summarize_to_budget, truncate_to_tokens
+from src.instrumentation import count_tokens, tracer
+
+REACT_PROMPT = """You are answering a question for a research report. You can use these tools:
+{tools}
+
+Use this format:
+Thought: what you need to find out next
+Action: the tool name
+Action Input: the tool arguments as a JSON object
+
+You may write several Action / Action Input pairs in one step when the calls do not depend on each other; they run in parallel. Their results come back as Observations. When you have enough information, reply with:
+Thought: I can answer without using any more tools.
+Answer: the answer
+
+Question: {question}
+{trace}"""
+FINAL_PROMPT = "{prompt}\nYou are out of steps. Give the best answer you can from the observations above.\nAnswer:"
+ACTION = re.compile(r"Action:\s*(?P<name>[^\n]+)\s*\nAction Input:\s*(?P<input>\{.*?\}|[^\n]*)(?=\s*(?:\nAction:|\nThought:|\nObservation:|$))", re.DOTALL)
+ANSWER = re.compile(r"Answer:\s*(?P<answer>.*)", re.DOTALL)
+
+
+class Tool:
+    """A callable the agent can use. `fn` may be sync (run in a worker thread) or async.
+    Results of `deterministic` tools are cached per argument set."""
+
+    def __init__(self, name, fn, description, deterministic=True):
+        self.name = name
+        self.fn = fn
+        self.description = description
+        self.deterministic = deterministic
+        self.params = list(inspect.signature(fn).parameters)
+
+    def describe(self):
+        return f"- {self.name}({', '.join(self.params)}): {self.description}"
+
+    def kwargs(self, raw_input):
+        try:
+            kwargs = json.loads(raw_input)
+        except json.JSONDecodeError:
+            kwargs = None
+        if isinstance(kwargs, dict):
+            return kwargs
+        # a bare value is accepted for single-argument tools
+        if len(self.params) == 1:
+            return {self.params[0]: raw_input.strip().strip('"')}
+        raise ValueError(f"Action Input for {self.name} must be a JSON object with {self.params}")
+
+    async def __call__(self, **kwargs):
+        if inspect.iscoroutinefunction(self.fn):
+            return await self.fn(**kwargs)
+        return await asyncio.to_thread(self.fn, **kwargs)
+
+    @classmethod
+    def from_query_engine(cls, query_engine, name="search_papers", description=None):
+        async def search(query):
+            return str(await query_engine.aquery(query))
+
+        description = description or "Search the selected research papers. Input: a focused search query."
+        return cls(name, search, description)
+
+
+class ToolCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(tool, kwargs):
+        return tool.name, json.dumps(kwargs, sort_keys=True, default=str)
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class ReActMemory:
+    """Reasoning trace kept within `budget` tokens. Observations are capped at
+    `max_observation_tokens`; when the trace is over budget the oldest steps are folded into a
+    summary (by the LLM when one is given, otherwise they are dropped)."""
+
+    def __init__(self, budget=3000, max_observation_tokens=600, llm=None):
+        self.budget = budget
+        self.max_observation_tokens = max_observation_tokens
+        self.llm = llm
+        self.summary = ""
+        self.steps = []
+
+    def add_step(self, text):
+        self.steps.append(text.strip())
+
+    def add_observation(self, tool_name, observation):
+        self.steps.append(f"Observation ({tool_name}): {truncate_to_tokens(observation, self.max_observation_tokens)}")
+
+    def render(self):
+        parts = ([f"Summary of earlier steps: {self.summary}"] if self.summary else []) + self.steps
+        return "\n".join(parts)
+
+    async def fit(self):
+        while count_tokens(self.render()) > self.budget and len(self.steps) > 1:
+            half = max(len(self.steps) // 2, 1)
+            folded = "\n".join(([self.summary] if self.summary else []) + self.steps[:half])
+            self.steps = self.steps[half:]
+            if self.llm is not None:
+                self.summary = await summarize_to_budget(folded, self.budget // 4, self.llm)
+            else:
+                self.summary = f"{half} earlier steps omitted."
+
+
+class ReActResponse:
+    def __init__(self, response, sources, steps):
+        self.response = response
+        self.source_nodes = sources
+        self.steps = steps
+
+    def __str__(self):
+        return self.response
+
+
+class ReActAgent:
+    def __init__(self, llm, tools, max_steps=6, memory_budget=3000, max_observation_tokens=600, summarize_memory=False, tool_cache=None, timeout=60.0):
+        self.llm = llm
+        self.tools = {tool.name: tool for tool in tools}
+        self.max_steps = max_steps
+        self.memory_budget = memory_budget
+        self.max_observation_tokens = max_observation_tokens
+        self.summarize_memory = summarize_memory
+        self.tool_cache = tool_cache if tool_cache is not None else ToolCache()
+        self.timeout = timeout  # per tool call
+
+    def prompt(self, question, memory):
+        tools = "\n".join(tool.describe() for tool in self.tools.values())
+        return REACT_PROMPT.format(tools=tools, question=question, trace=memory.render())
+
+    async def call_tool(self, name, raw_input):
+        tool = self.tools.get(name)
+        if tool is None:
+            return f"Tool {name} does not exist"
+        try:
+            kwargs = tool.kwargs(raw_input)
+        except ValueError as e:
+            return str(e)
+        key = ToolCache.key(tool, kwargs)
+        if tool.deterministic:
+            cached = self.tool_cache.get(key)
+            if cached is not None:
+                return cached
+        with tracer.span("tool_call", tool=name):
+            try:
+                result = str(await asyncio.wait_for(tool(**kwargs), timeout=self.timeout))
+            except asyncio.TimeoutError:
+                return f"Tool {name} timed out after {self.timeout}s"
+            except Exception as e:
+                return f"Error calling tool {name}: {e}"
+        if tool.deterministic:
+            self.tool_cache.put(key, result)
+        return result
+
+    async def arun(self, question):
+        memory = ReActMemory(self.memory_budget, self.max_observation_tokens, llm=self.llm if self.summarize_memory else None)
+        sources = []
+        with tracer.span("react_agent") as span:
+            for step in range(self.max_steps):
+                await memory.fit()
+                output = str(await self.llm.acomplete(self.prompt(question, memory))).strip()
+                answer = ANSWER.search(output)
+                actions = [(match["name"].strip(), match["input"].strip()) for match in ACTION.finditer(output)]
+                if answer and not actions:
+                    span.set(steps=step + 1)
+                    return ReActResponse(answer["answer"].strip(), sources, step + 1)
+                memory.add_step(output)
+                if not actions:
+                    memory.add_step("Observation: respond with an Action or an Answer in the format above.")
+                    continue
+                # de-duplicate identical calls within the step, then run them concurrently
+                unique = list(dict.fromkeys(actions))
+                results = await asyncio.gather(*[self.call_tool(name, raw_input) for name, raw_input in unique])
+                for (name, _), result in zip(unique, results):
+                    sources.append({"tool": name, "text": result})
+                    memory.add_observation(name, result)
+
+            await memory.fit()
+            output = str(await self.llm.acomplete(FINAL_PROMPT.format(prompt=self.prompt(question, memory))))
+            span.set(steps=self.max_steps, exhausted=True)
+            answer = ANSWER.search(output)
+            return ReActResponse((answer["answer"] if answer else output).strip(), sources, self.max_steps)
+
+    async def aquery(self, query):
+        return await self.arun(query)
+
+    def query(self, query):
+        return asyncio.run(self.arun(query))
+
+
+def react_query_engine(query_engine, llm, **kwargs):
+    """ReAct agent that answers INDEX queries by searching `query_engine` as often as it needs"""
+    return ReActAgent(llm, [Tool.from_query_engine(query_engine)], **kwargs)
@@ -0,0 +1,41 @@
+"""Process-wide registry of lazily constructed clients and LLMs.
+
+Heavy SDK imports and client construction happen inside the factories, on first use, instead of at
+module import, so importing `src` modules (and every Streamlit rerun or CLI start) stays cheap.
+Instances with a `shutdown()` method, such as worker pools, are shut down when they are removed.
+"""
+import threading
+
+_instances = {}
+_lock = threading.RLock()
+
+
+def get_or_create(key, factory):
+    """Return the instance registered under `key`, building it with `factory()` the first time"""
+    instance = _instances.get(key)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(key)
+            if instance is None:
+                instance = factory()
+                _instances[key] = instance
+    return instance
+
+
+def _shutdown(instance):
+    if callable(getattr(instance, "shutdown", None)):
+        instance.shutdown(wait=False)
+
+
+def clear():
+    with _lock:
+        instances = list(_instances.values())
+        _instances.clear()
+    for instance in instances:
+        _shutdown(instance)
+
+
+def discard(key):
+    with _lock:
+        instance = _instances.pop(key, None)
+    _shutdown(instance)
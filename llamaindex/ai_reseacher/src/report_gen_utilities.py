@@ -1,12 +1,13 @@
 import re
+import json
 from src.llm_utils import get_llm
-llm = get_llm()
 def extract_title(outline):
     first_line = outline.strip().split("\n")[0]
     return first_line.strip("# ").strip()
 
     
-def generate_query_with_llm(title,section, subsection):
+def generate_query_with_llm(title,section, subsection, llm=None):
+    llm = llm or get_llm()
     prompt = f"Generate a research query for a report on {title}. "
     prompt += f"The query should be for the subsection '{subsection}' under the main section '{section}'. "
     prompt += "The query should guide the research to gather relevant information for this part of the report. The query should be clear, short and concise. "
@@ -15,8 +16,9 @@ def generate_query_with_llm(title,section, subsection):
 
     return str(response).strip()
 
-def classify_query(query):
+def classify_query(query, llm=None):
     """Function to classify the query as either 'LLM' or 'INDEX' based on the query content"""
+    llm = llm or get_llm()
 
     prompt = f"""Classify the following query as either "LLM" if it can be answered directly by a large language model with general knowledge, or "INDEX" if it likely requires querying an external index or database for specific or up-to-date information.
 
@@ -34,29 +36,101 @@ def classify_query(query):
         classification = "INDEX"
     return classification
 
-def parse_outline_and_generate_queries(outline):
+def parse_json_list(text, expected_len):
+    """Parse a JSON list out of an LLM response, returning None if it is unusable"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("\n") + 1:] if "\n" in text else text
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(items, list) or len(items) != expected_len:
+        return None
+    return items
+
+
+def generate_queries_batch(title, items, llm=None):
+    """Generate one research query per (section, subsection) pair with a single LLM call.
+    Entries the model leaves out or mangles fall back to generate_query_with_llm."""
+    llm = llm or get_llm()
+    if not items:
+        return []
+    listing = "\n".join(f"{i}. Subsection '{subsection}' under the main section '{section}'" for i, (section, subsection) in enumerate(items, start=1))
+    prompt = f"Generate research queries for a report on {title}. "
+    prompt += "Write one query for each of the following parts of the report:\n\n"
+    prompt += listing + "\n\n"
+    prompt += "Each query should guide the research to gather relevant information for its part of the report. Each query should be clear, short and concise. "
+    prompt += f"Respond with only a JSON list of exactly {len(items)} strings, in the same order as above."
+
+    queries = parse_json_list(str(llm.complete(prompt)), len(items)) or [None] * len(items)
+    for i, (section, subsection) in enumerate(items):
+        if not isinstance(queries[i], str) or not queries[i].strip():
+            queries[i] = generate_query_with_llm(title, section, subsection, llm=llm)
+        queries[i] = queries[i].strip()
+    return queries
+
+
+def classify_queries_batch(queries, llm=None):
+    """Classify every query as 'LLM' or 'INDEX' with a single LLM call.
+    Entries the model leaves out or mangles fall back to classify_query."""
+    llm = llm or get_llm()
+    if not queries:
+        return []
+    listing = "\n".join(f'{i}. "{query}"' for i, query in enumerate(queries, start=1))
+    prompt = f"""Classify each of the following queries as either "LLM" if it can be answered directly by a large language model with general knowledge, or "INDEX" if it likely requires querying an external index or database for specific or up-to-date information.
+
+    Queries:
+{listing}
+
+    Consider the following:
+    1. If the query asks for general knowledge, concepts, or explanations, classify as "LLM".
+    2. If the query asks for specific facts, recent events, or detailed information that might not be in the LLM's training data, classify as "INDEX".
+    3. If unsure, err on the side of "INDEX".
+
+    Respond with only a JSON list of exactly {len(queries)} strings, each "LLM" or "INDEX", in the same order as the queries."""
+
+    classifications = parse_json_list(str(llm.complete(prompt)), len(queries)) or [None] * len(queries)
+    for i, query in enumerate(queries):
+        label = str(classifications[i]).strip().upper() if classifications[i] is not None else None
+        classifications[i] = label if label in ["LLM", "INDEX"] else classify_query(query, llm=llm)
+    return classifications
+
+
+def parse_outline_and_generate_queries(outline, llm=None):
     lines = outline.strip().split("\n")
     title = extract_title(outline)
     current_section = ""
-    queries = {}
+    subsections = {}
     
     for line in lines[1:]:
         if line.startswith("## "):
             current_section = line.strip("# ").strip()
-            queries[current_section] = {}
+            subsections[current_section] = []
             
         elif re.match(r'^\d+\.\d+\.', line):
-            subsection = line.strip()
-            query = generate_query_with_llm(title,current_section, subsection)
-            classification = classify_query(query)
-            queries[current_section][subsection] = {"query":query, "classification":classification}
-    
-    #handle the sections without subsections
-    for section in queries:
-        if not queries[section]:
-            query = generate_query_with_llm(title,section, "General Overview")
-            queries[section]['General'] = {"query":query, "classification":"LLM"}
+            subsections[current_section].append(line.strip())
+
+    # plan every query up front so generation and classification are one LLM call each
+    items = []
+    for section, section_subsections in subsections.items():
+        if section_subsections:
+            items.extend((section, subsection) for subsection in section_subsections)
+        else:
+            #handle the sections without subsections
+            items.append((section, "General Overview"))
+    generated = generate_queries_batch(title, items, llm=llm)
+
+    to_classify = [i for i, (_, subsection) in enumerate(items) if subsection != "General Overview"]
+    classified = classify_queries_batch([generated[i] for i in to_classify], llm=llm)
+    classifications = dict(zip(to_classify, classified))
+
+    queries = {section: {} for section in subsections}
+    for i, (section, subsection) in enumerate(items):
+        if subsection == "General Overview":
+            queries[section]['General'] = {"query":generated[i], "classification":"LLM"}
+        else:
+            queries[section][subsection] = {"query":generated[i], "classification":classifications[i]}
     
     return queries  
-            
-            
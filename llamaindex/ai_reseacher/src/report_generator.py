@@ -1,106 +1,65 @@
-from typing import Any
+from __future__ import annotations
+from typing import Any, TYPE_CHECKING
 import re
-from src.report_gen_utilities import extract_title, generate_query_with_llm, classify_query
-from llama_index.core.llms.function_calling import FunctionCallingLLM
+from src.report_gen_utilities import extract_title, parse_outline_and_generate_queries
 from src.llm_utils import get_llm
 import asyncio
-from src.pdf_handler import parse_and_cache_pdfs
-from src.llama_parse_utils import upload_documents, index_as_query_engine
-llm = get_llm()
+from src.llama_parse_utils import PIPELINE_NAME, index_as_query_engine, record_name, upload_documents
+from src.instrumentation import tracer
+from src.ingest_manifest import document_key, get_manifest
+from src.context_packing import PROMPT_BUDGETS, apack
+
+if TYPE_CHECKING:
+    from llama_index.core.llms.function_calling import FunctionCallingLLM
 
 class ReportGenerationAgent:
-    def __init__(self,query_engine: Any, llm: FunctionCallingLLM):
+    def __init__(self,query_engine: Any, llm: FunctionCallingLLM, max_concurrency: int = 8, timeout: float = 120.0, semaphore: asyncio.Semaphore = None, summarize_context: bool = False):
         self.query_engine = query_engine
         self.llm = llm
+        self.max_concurrency = max_concurrency  # max in-flight LLM / query engine calls
+        self.timeout = timeout  # seconds allowed per call
+        self.semaphore = semaphore  # shared across agents to enforce a global budget instead
+        self.summarize_context = summarize_context  # map-reduce oversized section context instead of truncating it
+
+    def call_semaphore(self):
+        return self.semaphore or asyncio.Semaphore(self.max_concurrency)
     
     
     def parse_outline_and_generate_queries(self,outline):
-        lines = outline.strip().split("\n")
-        title = extract_title(outline)
-        current_section = ""
-        queries = {}
-        
-        for line in lines[1:]:
-            if line.startswith("## "):
-                current_section = line.strip("# ").strip()
-                queries[current_section] = {}
-                
-            elif re.match(r'^\d+\.\d+\.', line):
-                subsection = line.strip()
-                query = generate_query_with_llm(title,current_section, subsection)
-                classification = classify_query(query)
-                queries[current_section][subsection] = {"query":query, "classification":classification}
-        
-        #handle the sections without subsections
-        for section in queries:
-            if not queries[section]:
-                query = generate_query_with_llm(title,section, "General Overview")
-                queries[section]['General'] = {"query":query, "classification":"LLM"}
-        return queries  
+        return parse_outline_and_generate_queries(outline, llm=self.llm)
     
-    def generate_section_content(self,queries):
-        sections_content = {}
+    async def answer_query(self, query, classification, semaphore):
+        async with semaphore:
+            if classification == "LLM":
+                call = self.llm.acomplete(query+"Give a short answer.")
+            else:
+                call = self.query_engine.aquery(query)
+            with tracer.span("answer_query", classification=classification) as span:
+                try:
+                    return str(await asyncio.wait_for(call, timeout=self.timeout))
+                except asyncio.TimeoutError:
+                    span.set(timed_out=True)
+                    print(f"Timed out after {self.timeout}s answering: {query}")
+                    return "Content could not be generated for this section."
+
+    async def agenerate_section_content(self, queries):
+        # fan out every subsection at once, bounded by max_concurrency
+        semaphore = self.call_semaphore()
+        keys = []
+        jobs = []
         for section, subsections in queries.items():
-            sections_content[section] = {}
-            subsection_keys = subsections.keys()
-            for subsection in subsection_keys:
-                data = subsections[subsection]
-                query = data['query']
-                classification = data['classification']
-                if classification == "LLM":
-                    answer = str(self.llm.complete(query+"Give a short answer."))
-                else:
-                    answer = str(self.query_engine.query(query))
-                sections_content[section][subsection] = answer
+            for subsection, data in subsections.items():
+                keys.append((section, subsection))
+                jobs.append(self.answer_query(data['query'], data['classification'], semaphore))
+        answers = await asyncio.gather(*jobs)
+
+        # gather keeps submission order, so the outline order is preserved
+        sections_content = {section: {} for section in queries}
+        for (section, subsection), answer in zip(keys, answers):
+            sections_content[section][subsection] = answer
         return sections_content
     
 
-    def format_report(self, sections_content, outline):
-        report = ""
-        introduction_content = None
-        conclusion_content = None
-        
-        for section, subsections in sections_content.items():
-            section_match = re.match(r'^(\d+\.)\s*(.*)$', section)
-            if section_match:
-                section_num, section_title = section_match.groups()
-                
-                
-                if "introduction" in section.lower():
-                    introduction_num, introduction_title = section_num, section_title
-                    combined_intro_content = ("\n").join(subsections.values())
-                    introduction_query = f"Refine and consolidate the introduction:\n\n{combined_intro_content}"
-                    introduction_content = str(self.llm.complete(introduction_query))
-                    continue 
-                
-                elif "conclusion" in section.lower():
-                    conclusion_num, conclusion_title = section_num, section_title
-                    combined_conclusion_content = ("\n").join(subsections.values())
-                    conclusion_query = f"Refine and consolidate the conclusion:\n\n{combined_conclusion_content}"
-                    conclusion_content = str(self.llm.complete(conclusion_query))
-                    continue
-                
-                else:
-                    combined_content = ("\n").join(subsections.values())
-                    summary_query = f"Provide a short summary for section '{section}': \n\n {combined_content}"
-                    section_summary = str(self.llm.complete(summary_query))
-                    report += f"# {section_num} {section_title}\n\n {section_summary}\n\n"
-                    
-                    report = self.get_subsection_content(subsections, report)
-        
-        if introduction_content:
-            report = f"# {introduction_num} {introduction_title}\n\n{introduction_content}\n\n" + report
-        
-        if conclusion_content:
-            report += f"# {conclusion_num} {conclusion_title}\n\n{conclusion_content}\n\n"
-        
-        # Add title
-        title = extract_title(outline)
-        report = f"# {title}\n\n{report}"
-        
-        return report
-
-
     def get_subsection_content(self, subsections,report):
         for subsection in sorted(subsections.keys(), key=lambda x: re.search(r'(\d+\.\d+)', x).group(1) if re.search(r'(\d+\.\d+)', x) else x):
             content = subsections[subsection]
@@ -111,20 +70,103 @@ class ReportGenerationAgent:
             else:
                 report += f"## {subsection}\n\n{content}\n\n"
         return report
+
+    def report_plan(self, sections_content):
+        # sections in report order (introduction, body, conclusion) with the prompt that refines each
+        introduction = None
+        conclusion = None
+        body = []
+        for section, subsections in sections_content.items():
+            section_match = re.match(r'^(\d+\.)\s*(.*)$', section)
+            if not section_match:
+                continue
+            section_num, section_title = section_match.groups()
+            contents = list(subsections.values())
+            entry = {"num": section_num, "title": section_title, "contents": contents, "subsections": None}
+            if "introduction" in section.lower():
+                introduction = {**entry, "kind": "introduction", "prompt": "Refine and consolidate the introduction:\n\n"}
+            elif "conclusion" in section.lower():
+                conclusion = {**entry, "kind": "conclusion", "prompt": "Refine and consolidate the conclusion:\n\n"}
+            else:
+                summary_query = f"Provide a short summary for section '{section}': \n\n "
+                body.append({**entry, "kind": "section_summary", "prompt": summary_query, "subsections": subsections})
+        return ([introduction] if introduction else []) + body + ([conclusion] if conclusion else [])
+
+    def render_section(self, entry, refined):
+        if entry["subsections"] is None:
+            return f"# {entry['num']} {entry['title']}\n\n{refined}\n\n" if refined else ""
+        report = f"# {entry['num']} {entry['title']}\n\n {refined}\n\n"
+        return self.get_subsection_content(entry["subsections"], report)
+
+    async def refine_section(self, entry, semaphore):
+        # subsection answers are packed into the prompt type's token budget, then appended to the prompt
+        content = await apack(entry["contents"], PROMPT_BUDGETS[entry["kind"]], llm=self.llm if self.summarize_context else None)
+        async with semaphore:
+            try:
+                return str(await asyncio.wait_for(self.llm.acomplete(entry["prompt"] + content), timeout=self.timeout))
+            except asyncio.TimeoutError:
+                print(f"Timed out after {self.timeout}s refining section {entry['num']} {entry['title']}")
+                return content
+
+    async def astream_report(self, sections_content, outline):
+        """Yield the report section by section. All refinement calls start at once; each section is
+        yielded as soon as it and every section before it is ready."""
+        plan = self.report_plan(sections_content)
+        semaphore = self.call_semaphore()
+        tasks = [asyncio.ensure_future(self.refine_section(entry, semaphore)) for entry in plan]
+        try:
+            title = extract_title(outline)
+            yield f"# {title}\n\n"
+            for entry, task in zip(plan, tasks):
+                section = self.render_section(entry, await task)
+                if section:
+                    yield section
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def aformat_report(self, sections_content, outline):
+        return "".join([section async for section in self.astream_report(sections_content, outline)])
     
     async def run_workflow(self,outline):
-        queries = self.parse_outline_and_generate_queries(outline)
-        sections_content = self.generate_section_content(queries)
-        report = self.format_report(sections_content, outline)
+        with tracer.span("plan_queries"):
+            # planning uses the sync LLM API; keep it off the loop so concurrent reports keep running
+            queries = await asyncio.to_thread(self.parse_outline_and_generate_queries, outline)
+        with tracer.span("generate_section_content"):
+            sections_content = await self.agenerate_section_content(queries)
+        with tracer.span("format_report"):
+            report = await self.aformat_report(sections_content, outline)
         return report
 
+async def build_query_engine(docs, index_backend="cloud", react=False, openai_api_key=None, llama_cloud_api_key=None):
+    """Query engine for INDEX subsections. With `react` a ReAct agent answers each query,
+    searching the index as many times as it needs. Keys default to the ones in the environment.
+    Index building blocks (embedding, BM25, Llama Cloud lookups), so it runs in worker threads and
+    concurrent jobs on the same loop keep going."""
+    # numpy-backed modules are only needed once a report runs
+    from src.local_index import local_index_as_query_engine
+    from src.react_agent import react_query_engine
+    from src.retrieval_cache import CachedQueryEngine, get_retrieval_cache
 
-async def generate_report(selected_papers, outline, openai_api_key):
-    docs = parse_and_cache_pdfs(selected_papers)
-    await upload_documents(docs)
-    query_engine = index_as_query_engine()
-    
-    agent = ReportGenerationAgent(query_engine, llm)
-    report = asyncio.run(agent.run_workflow(outline))
-    return report
-    
\ No newline at end of file
+    # retrieval is restricted to the report's papers, so INDEX queries go through the retrieval
+    # cache keyed on the version of just those papers
+    paper_ids = [document_key(doc)[0] for doc in docs]
+    if index_backend == "local":
+        with tracer.span("local_index"):
+            index, query_engine = await asyncio.to_thread(
+                local_index_as_query_engine, docs, llm=get_llm(api_key=openai_api_key)
+            )
+        query_engine = CachedQueryEngine(query_engine, get_retrieval_cache(), lambda: ("local", index.partition_version(paper_ids)))
+    else:
+        with tracer.span("upload_documents"):
+            await upload_documents(docs, api_key=llama_cloud_api_key, openai_api_key=openai_api_key)
+        with tracer.span("index_as_query_engine"):
+            query_engine = await asyncio.to_thread(
+                index_as_query_engine, llama_cloud_api_key, paper_ids=paper_ids, openai_api_key=openai_api_key
+            )
+        # each project has its own index, so its version (and the cache entries) are per project
+        index_name = await asyncio.to_thread(record_name, PIPELINE_NAME, llama_cloud_api_key)
+        query_engine = CachedQueryEngine(
+            query_engine, get_retrieval_cache(), lambda: ("cloud", index_name, get_manifest().index_version(index_name, paper_ids))
+        )
+    return react_query_engine(query_engine, get_llm(api_key=openai_api_key)) if react else query_engine
@@ -0,0 +1,171 @@
+"""Retrieval cache in front of the INDEX query engine.
+
+Results are keyed on the normalized query text plus the index version, so anything that changes
+the index (a new upload, a re-indexed paper) invalidates them. Versions are per partition, so the
+entries of concurrent reports over different paper sets live side by side and superseded versions
+age out of the LRU. Optionally a semantic layer reuses a cached result when a new query's
+embedding is within `threshold` cosine similarity of a cached query for the same index version.
+Identical queries issued concurrently share one in-flight call. Queries are only embedded after
+an exact miss, and empty answers (a cloud index still ingesting) are not cached.
+
+The shared cache is exact-match only. RETRIEVAL_CACHE_SEMANTIC=1 turns on the semantic layer with
+OpenAI embeddings (billed to OPENAI_API_KEY). Lexical embeddings such as the local index's
+HashingEmbedder rate queries that differ in one key word (medical vs. legal) as near-identical,
+so they are not used here.
+"""
+import asyncio
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# ada-002 cosine similarity rarely drops below 0.8 even for unrelated text, so only near-paraphrases count
+SEMANTIC_THRESHOLD = 0.97
+
+
+def normalize_query(query):
+    return " ".join(_PUNCTUATION.sub(" ", query.lower()).split())
+
+
+class RetrievalCache:
+    def __init__(self, max_entries=512, embedder=None, threshold=0.92):
+        self.max_entries = max_entries
+        self.embedder = embedder  # None disables the semantic layer
+        self.threshold = threshold
+        self.entries = OrderedDict()  # (version, normalized query) -> (embedding, response)
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.entries.clear()
+
+    def embed(self, normalized):
+        return self.embedder.embed([normalized])[0] if self.embedder is not None else None
+
+    def get(self, version, normalized):
+        with self._lock:
+            key = (version, normalized)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.exact_hits += 1
+                return self.entries[key][1]
+            return None
+
+    def get_similar(self, version, embedding):
+        """Semantic lookup after an exact miss; counts the miss when nothing is close enough"""
+        with self._lock:
+            keys = [k for k in self.entries if k[0] == version] if embedding is not None else []
+            if keys:
+                matrix = np.stack([self.entries[k][0] for k in keys])
+                scores = matrix @ embedding
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.entries.move_to_end(keys[best])
+                    self.semantic_hits += 1
+                    return self.entries[keys[best]][1]
+            self.misses += 1
+            return None
+
+    def record_shared(self):
+        # a concurrent identical query reused an in-flight call
+        with self._lock:
+            self.exact_hits += 1
+
+    def put(self, version, normalized, embedding, response):
+        with self._lock:
+            self.entries[(version, normalized)] = (embedding, response)
+            self.entries.move_to_end((version, normalized))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+            "entries": len(self.entries),
+        }
+
+
+def is_cacheable(response):
+    # an empty answer or one without sources usually means the index had nothing ingested yet
+    if not str(getattr(response, "response", response) or "").strip():
+        return False
+    return getattr(response, "source_nodes", None) != []
+
+
+class CachedQueryEngine:
+    """Wraps a query engine (query/aquery) with a RetrievalCache. `index_version` is called before
+    each lookup and returns something that changes whenever the index contents change."""
+
+    def __init__(self, query_engine, cache, index_version):
+        self.query_engine = query_engine
+        self.cache = cache
+        self.index_version = index_version
+        self.in_flight = {}
+
+    def query(self, query):
+        version = self.index_version()
+        normalized = normalize_query(query)
+        response = self.cache.get(version, normalized)
+        if response is not None:
+            return response
+        embedding = self.cache.embed(normalized)
+        response = self.cache.get_similar(version, embedding)
+        if response is None:
+            response = self.query_engine.query(query)
+            if is_cacheable(response):
+                self.cache.put(version, normalized, embedding, response)
+        return response
+
+    async def aquery(self, query):
+        version = self.index_version()
+        normalized = normalize_query(query)
+        if normalized in self.in_flight:
+            self.cache.record_shared()
+            return await asyncio.shield(self.in_flight[normalized])
+
+        response = self.cache.get(version, normalized)
+        if response is not None:
+            return response
+        future = asyncio.ensure_future(self._aquery_miss(query, version, normalized))
+        self.in_flight[normalized] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self.in_flight.pop(normalized, None)
+
+    async def _aquery_miss(self, query, version, normalized):
+        embedding = None
+        if self.cache.embedder is not None:
+            # embedding is a paced network call, so keep it off the event loop
+            embedding = await asyncio.to_thread(self.cache.embed, normalized)
+        response = self.cache.get_similar(version, embedding)
+        if response is None:
+            response = await self.query_engine.aquery(query)
+            if is_cacheable(response):
+                self.cache.put(version, normalized, embedding, response)
+        return response
+
+
+_cache = None
+
+
+def get_retrieval_cache():
+    global _cache
+    if _cache is None:
+        if os.environ.get("RETRIEVAL_CACHE_SEMANTIC", "") == "1":
+            from src.embedding_pipeline import OpenAIEmbedder
+
+            _cache = RetrievalCache(embedder=OpenAIEmbedder(), threshold=SEMANTIC_THRESHOLD)
+        else:
+            _cache = RetrievalCache()
+    return _cache
@@ -1,22 +1,63 @@
-import openai
-import requests
-from llama_cloud.client import LlamaCloud
+"""API key checks for the sidebar.
+
+Checks use the pooled per-key clients and their results are cached per key, so Streamlit reruns
+and repeated clicks do not hit the network again. Valid keys are re-checked after VALID_TTL
+seconds, rejected keys sooner; network errors are not cached.
+
+The checks return True (valid), False (rejected by the provider) or None (the provider could not
+be reached, so the key is unverified and the check should be retried).
+"""
+import threading
+import time
+
+from src.client_pool import discard_client, get_llama_cloud_client, get_openai_client, key_id
+
+VALID_TTL = 600
+INVALID_TTL = 60
+
+_results = {}  # (client kind, key id) -> (is_valid, checked_at)
+_lock = threading.Lock()
+
+
+def cached_check(kind, api_key, check):
+    key = (kind, key_id(api_key))
+    with _lock:
+        cached = _results.get(key)
+    if cached is not None:
+        is_valid, checked_at = cached
+        if time.monotonic() - checked_at < (VALID_TTL if is_valid else INVALID_TTL):
+            return is_valid
+    is_valid = check()
+    if is_valid is False:
+        discard_client(kind, api_key)  # no point keeping connections open for a rejected key
+    if is_valid is not None:
+        with _lock:
+            _results[key] = (is_valid, time.monotonic())
+    return is_valid
+
 
 def check_openai_api_key(api_key):
-    client = openai.OpenAI(api_key=api_key)
-    try:
-        client.models.list()
-    except openai.AuthenticationError:
-        return False
-    else:
+    import openai
+
+    def check():
+        try:
+            get_openai_client(api_key).models.list()
+        except openai.AuthenticationError:
+            return False
+        except openai.APIConnectionError:
+            return None
         return True
-    
-    
+
+    return cached_check("openai_client", api_key, check)
+
+
 def check_llama_cloud_api_key(api_key):
-    try:
-        client = LlamaCloud(token=api_key)
-        projects = client.projects.list_projects()
-        if client:
-            return True
-    except Exception:
-        return False
\ No newline at end of file
+    def check():
+        try:
+            get_llama_cloud_client(api_key).projects.list_projects()
+        except Exception as e:
+            # an HTTP error status means the service answered; anything else says nothing about the key
+            return False if getattr(e, "status_code", None) is not None else None
+        return True
+
+    return cached_check("llama_cloud", api_key, check)